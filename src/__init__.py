@@ -5,12 +5,22 @@ print('RUNNING TEST:', os.getenv('TESTS', 'False'))
 
 base_dir = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.normpath(os.path.join(base_dir, '..')) 
-from .config import PASSPORT_APP
+from .config import (
+    PASSPORT_APP, 
+    PASSPORT_LOCAL_DB, 
+    PASSPORT_ID_BATCH_SIZE, 
+    PASSPORT_QUERY_WORKERS, 
+    PASSPORT_CACHE_SETTLE_DAYS,
+    INGEST_CHUNK_SIZE, 
+    SEGMENTS, 
+    SEGMENT_AGGREGATES
+)
 
 #not running a test
 if not os.getenv('TESTS', False):
     from .config import (
         DATA_DONORS, 
+        EXPORT_WORKING_EXCEL,
         DATA_DEMOGRAPHICS, 
         DATA_START, 
         DATA_END, 
@@ -25,10 +35,19 @@ if not os.getenv('TESTS', False):
     DATA_DONORS_RAW = os.path.join(DATA_RAW_DIR, DATA_DONORS)
     DATA_DEMOGRAPHICS_RAW = os.path.join(DATA_RAW_DIR, DATA_DEMOGRAPHICS)
 
-    DATA_DONORS_WORKING = os.path.join(DATA_PROCESSED_DIR, DATA_DONORS.split('.xlsx')[0] + '-working.xlsx')
+    DATA_DONORS_WORKING = os.path.join(DATA_PROCESSED_DIR, DATA_DONORS.split('.xlsx')[0] + '-working.parquet')
+    DATA_DONORS_WORKING_EXPORT = None
+    if EXPORT_WORKING_EXCEL:
+        DATA_DONORS_WORKING_EXPORT = os.path.join(DATA_PROCESSED_DIR, DATA_DONORS.split('.xlsx')[0] + '-working.xlsx')
+    DATA_DONORS_PLEDGES = os.path.join(DATA_PROCESSED_DIR, DATA_DONORS.split('.xlsx')[0] + '-pledges.parquet')
+    DATA_DONORS_DAILY = os.path.join(DATA_PROCESSED_DIR, DATA_DONORS.split('.xlsx')[0] + '-daily.parquet')
     DATA_DONORS_PROCESSED = os.path.join(DATA_PROCESSED_DIR, DATA_DONORS.split('.xlsx')[0] + '.csv')
     DATA_DONORS_NEW_PROCESSED = os.path.join(DATA_PROCESSED_DIR, DATA_DONORS.split('.xlsx')[0] + '-new.csv')
     DATA_DEMOGRAPHICS_PROCESSED = os.path.join(DATA_PROCESSED_DIR, DATA_DEMOGRAPHICS.split('.xlsx')[0] + '.csv')
+    DATA_DEMOGRAPHICS_STORE = os.path.join(DATA_PROCESSED_DIR, DATA_DEMOGRAPHICS.split('.xlsx')[0] + '.parquet')
+    DATA_MANIFEST = os.path.join(DATA_PROCESSED_DIR, 'manifest.json')
+    DATA_MODELS_DIR = os.path.join(DATA_PROCESSED_DIR, 'models')
+    DATA_PASSPORT_CACHE = os.path.join(DATA_PROCESSED_DIR, 'passport-views-cache.sqlite')
 
     PASSPORT_VIEWS_START = PASSPORT_VIEWS_START_DATE 
     PASSPORT_VIEWS_END = PASSPORT_VIEWS_END_DATE
@@ -42,10 +61,17 @@ else:
     DATA_DONORS_RAW = os.path.join(DATA_RAW_DIR, 'donors.xlsx')
     DATA_DEMOGRAPHICS_RAW = os.path.join(DATA_RAW_DIR, 'demographics.xlsx')
 
-    DATA_DONORS_WORKING = os.path.join(DATA_PROCESSED_DIR, 'donors-working.xlsx')
+    DATA_DONORS_WORKING = os.path.join(DATA_PROCESSED_DIR, 'donors-working.parquet')
+    DATA_DONORS_WORKING_EXPORT = os.path.join(DATA_PROCESSED_DIR, 'donors-working.xlsx')
+    DATA_DONORS_PLEDGES = os.path.join(DATA_PROCESSED_DIR, 'donors-pledges.parquet')
+    DATA_DONORS_DAILY = os.path.join(DATA_PROCESSED_DIR, 'donors-daily.parquet')
     DATA_DONORS_PROCESSED = os.path.join(DATA_PROCESSED_DIR, 'donors.csv')
     DATA_DONORS_NEW_PROCESSED = os.path.join(DATA_PROCESSED_DIR, 'donors-new.csv')
     DATA_DEMOGRAPHICS_PROCESSED = os.path.join(DATA_PROCESSED_DIR, 'demographics.csv')
+    DATA_DEMOGRAPHICS_STORE = os.path.join(DATA_PROCESSED_DIR, 'demographics.parquet')
+    DATA_MANIFEST = os.path.join(DATA_PROCESSED_DIR, 'manifest.json')
+    DATA_MODELS_DIR = os.path.join(DATA_PROCESSED_DIR, 'models')
+    DATA_PASSPORT_CACHE = os.path.join(DATA_PROCESSED_DIR, 'passport-views-cache.sqlite')
 
     DATA_EXPECTED_DONORS_WORKING = os.path.join(DATA_EXPECTED_PROCESSED_DIR, 'donors-working.xlsx')
     DATA_EXPECTED_DONORS_PROCESSED = os.path.join(DATA_EXPECTED_PROCESSED_DIR, 'donors.csv')
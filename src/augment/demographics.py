@@ -1,9 +1,11 @@
 import os
 import sys
 import argparse
+import numpy as np
 import pandas as pd
-from src.process.demographics import clean
-from src import ROOT_DIR, DATA_DEMOGRAPHICS_PROCESSED
+from src.process.cache import is_current
+from src.process.demographics import clean, get_fingerprint
+from src import ROOT_DIR, DATA_DEMOGRAPHICS_STORE
 
 def parse_args():
     """
@@ -33,25 +35,50 @@ def parse_args():
     arg, unknown = parser.parse_known_args()
     return arg.filename
 
-def get_data(data_file_processed=DATA_DEMOGRAPHICS_PROCESSED):
+def get_data(data_file_store=DATA_DEMOGRAPHICS_STORE):
     """
-    Gets data from data/processed/demographics.csv, running src.process.demographics.clean()
-    first if it doesn't exist, and returning a pandas.DataFrame.
+    Gets data from data/processed/demographics.parquet, running src.process.demographics.clean()
+    first if it doesn't exist or is stale, and returning a pandas.DataFrame with ID as index, 
+    sorted on ID.
 
     Arg:
-        data_file_processed (str): path to where csv demographics data file is or will be.               
+        data_file_store (str): path to where Parquet demographics data file is or will be.               
 
     Returns:
         pandas.DataFrame.
     """
 
-    #create processed demographics data if it doesn't exist
-    if not os.path.isfile(data_file_processed):
+    #create processed demographics data if it doesn't exist, or raw data has changed
+    if not is_current(data_file_store, get_fingerprint()):
         clean()
 
-    df = pd.read_csv(data_file_processed) 
+    df = pd.read_parquet(data_file_store) 
     return df 
 
+def lookup(df_demog, ids):
+    """
+    Looks up demographics for each id with a binary search on the sorted ID index, instead of 
+    hashing the whole table for each merge. Ids not found get missing values.
+
+    Args:
+        df_demog (pandas.DataFrame): demographics data from get_data(), with a sorted and unique
+            ID index.
+        ids (pandas.Series): ids to look up.
+
+    Returns:
+        pandas.DataFrame: demographics for each id, with the same index as ids.
+    """
+    if df_demog.empty:
+        return pd.DataFrame(np.nan, index=ids.index, columns=df_demog.columns)
+
+    index = df_demog.index.to_numpy()
+    positions = np.searchsorted(index, ids.to_numpy()).clip(max=len(index) - 1)
+    found = index[positions] == ids.to_numpy()
+
+    values = df_demog.to_numpy(dtype='float64')[positions]
+    values[~found] = np.nan
+    return pd.DataFrame(values, index=ids.index, columns=df_demog.columns)
+
 def get_category(name):
     """
     Get associated category for file name, for use in merge().
@@ -70,15 +97,17 @@ def get_category(name):
     }    
     return category[name]
 
-def merge(df_demog, data_file, category):
+def merge(df_demog, data_file, category, df_seg=None):
     """
     Merges dataframe of WealthEngine demographics data with dataframe from donor file
-    on ID, then aggregates categories to means. Result is saved to demographics.csv.
+    on ID, using lookup(), then aggregates categories to means. Result is saved to 
+    demographics.csv.
 
     Args:
         df_demog (pandas.DataFrame): demographics data from WealthEngine.
         data_file (str): path to CSV file with donor data. 
         category (str): name of column in data_file to aggregate demographic data on.
+        df_seg (pandas.DataFrame): optional data already read from data_file.
 
     Returns:
         None.     
@@ -87,13 +116,18 @@ def merge(df_demog, data_file, category):
     print('\nDEMOGRAPHICS:', df_demog.shape)
     print('\n', df_demog.head())
     
-    df_seg = pd.read_csv(data_file)
+    if df_seg is None:
+        df_seg = pd.read_csv(data_file)
     df_seg = df_seg[['ID', category]]    
     
     print('\nSEGMENTS:', df_seg.shape)
     print('\n', df_seg.head())
     
-    df = pd.merge(df_seg, df_demog, on='ID', how='left')
+    #look up ids in sorted index, unless WealthEngine has duplicate ids
+    if df_demog.index.is_unique and df_demog.index.is_monotonic_increasing:
+        df = df_seg.join(lookup(df_demog, df_seg['ID']))
+    else:
+        df = pd.merge(df_seg, df_demog.reset_index(), on='ID', how='left')
     
     print('\nSEGMENTS MERGED', df.shape)
     print('\n', df.head())
@@ -0,0 +1,119 @@
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from .demographics import get_data, get_category, merge
+from src import ROOT_DIR
+
+targets_all = ['cluster', 'new_donors', 'passport_gifts', 'passport_only']
+
+def parse_args():
+    """
+    Parses command-line options for which targets to augment and which overlays to add, with
+    each defaulting to all of them.
+
+    Examples:
+        $ python -m src.augment.multi
+        $ python -m src.augment.multi --targets cluster passport_gifts --overlays demographics
+
+    Returns:
+        tuple: lists of targets and overlays specified by the user.
+    """
+    parser = argparse.ArgumentParser(description='Run augment multi module')
+    parser.add_argument(
+        '--targets',
+        nargs='+',
+        choices=targets_all,
+        default=targets_all,
+        help='Specify targets to augment, e.g. cluster, new_donors, passport_gifts or passport_only'
+    )
+    parser.add_argument(
+        '--overlays',
+        nargs='+',
+        choices=['demographics', 'passport'],
+        default=['demographics', 'passport'],
+        help='Specify overlays to add, e.g. demographics or passport'
+    )
+    args, unknown = parser.parse_known_args()
+    return args.targets, args.overlays
+
+def timed(func, *args, **kwargs):
+    """
+    Runs func and times it.
+
+    Args:
+        func (function): function to run.
+        *args: positional arguments for func.
+        **kwargs: keyword arguments for func.
+
+    Returns:
+        float: seconds func took to run.
+    """
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+def augment(output_dir, targets, overlays):
+    """
+    Adds overlays to every target with an existing output/<target>/assignments.csv, in one
+    process:
+        -reads each assignments.csv, and demographics data, only once
+        -runs Passport views for each target in a background thread, since they mostly wait on
+         queries, while demographics are merged in the main thread
+        -runs Passport targets one after another, so later targets reuse views cached by earlier
+         ones, with each target's queries still run concurrently in batches
+
+    Args:
+        output_dir (str): path to output directory with a directory per target.
+        targets (List[str]): targets: 'cluster', 'new_donors', 'passport_gifts', 'passport_only'.
+        overlays (List[str]): overlays: 'demographics', 'passport'.
+
+    Returns:
+        pandas.DataFrame: seconds each overlay took per target.
+    """
+    files = {}
+    for target in targets:
+        path = os.path.join(output_dir, target, 'assignments.csv')
+        if os.path.isfile(path):
+            files[target] = path
+        else:
+            print('\nFile does not exist:\n', '  ', path)
+
+    dfs = {target: pd.read_csv(path) for target, path in files.items()}
+    timings = []
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        futures = {}
+        if 'passport' in overlays and files:
+            #imported here, so demographics can run where the Passport app isn't available
+            from .passport import get_passport_views_per_group
+
+            for target, path in files.items():
+                futures[target] = executor.submit(timed, get_passport_views_per_group, target, path,
+                                                  df=dfs[target])
+
+        if 'demographics' in overlays and files:
+            start = time.perf_counter()
+            df_demog = get_data()
+            timings.append(('all', 'demographics_data', time.perf_counter() - start))
+
+            for target, path in files.items():
+                seconds = timed(merge, df_demog, path, get_category(target), df_seg=dfs[target])
+                timings.append((target, 'demographics', seconds))
+
+        #raise any errors from thread
+        for target, future in futures.items():
+            timings.append((target, 'passport', future.result()))
+
+    timings = pd.DataFrame(timings, columns=['Target', 'Overlay', 'Seconds'])
+    print('\nTIMINGS:\n', timings.round(3).to_string(index=False))
+    return timings
+
+def main():
+    targets, overlays = parse_args()
+    augment(os.path.join(ROOT_DIR, 'output'), targets, overlays)
+
+if __name__ == '__main__':
+    sys.exit(main())
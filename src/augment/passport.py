@@ -1,98 +1,144 @@
 import os
 import sys
 from .helpers import parse_args
+from .passport_cache import get_cached_views, get_local_views
 import pandas as pd 
 from src import (
     ROOT_DIR, 
     PASSPORT_APP, 
+    PASSPORT_LOCAL_DB,
+    DATA_PASSPORT_CACHE,
     PASSPORT_VIEWS_START, 
     PASSPORT_VIEWS_END
 )
 
-sys.path.insert(0, PASSPORT_APP)
+#query a local stand-in database if set, which already has clean show names
+if PASSPORT_LOCAL_DB:
+    #takes ids as '1,2,3' like the VPPA query, for one batch at a time
+    def get_views(date_start, date_end, ids):
+        return get_local_views(date_start, date_end, ids.split(','), PASSPORT_LOCAL_DB)
 
-from VPPA.app.queries import get_channel_views_genres_members as get_views
-from VPPA.app.helpers_process import normalize_shows
+    def normalize_shows(df, col):
+        return df
+
+    #cache views from each stand-in database apart from views from the Passport app
+    cache_name = os.path.splitext(os.path.basename(PASSPORT_LOCAL_DB))[0]
+    cache_file = DATA_PASSPORT_CACHE.replace('.sqlite', '-' + cache_name + '.sqlite')
+
+else:
+    cache_file = DATA_PASSPORT_CACHE
+    sys.path.insert(0, PASSPORT_APP)
+
+    from VPPA.app.queries import get_channel_views_genres_members as get_views
+    from VPPA.app.helpers_process import normalize_shows
 
 def get_passport_views(date_start, date_end, ids):
     """
-    Gets top Passport shows watched by members. 
+    Gets Passport shows watched by members, with views per member per show. Views are read
+    from the local cache where already fetched, and only missing accounts and months are queried,
+    in concurrent batches of at most PASSPORT_ID_BATCH_SIZE ids.
 
     Args:
         date_start (str): format is '2022-09-01'.
         date_end (str): format is '2022-09-01' and is inclusive.
-        ids (List[str]): list of ids for SQL query, with format '1,2,3'.
+        ids (list-like): account ids, such as an ID column.
         
     Returns:
-        pandas.Dataframe: with columns Show and Views, and index starting at 1.
+        pandas.Dataframe: with columns ID, Show, Views and Genre.
     """
     
-    df = get_views(date_start, date_end, ids)  
+    df = get_cached_views(date_start, date_end, ids, get_views, cache_file)
     df = normalize_shows(df, 'content_channel') #cleans text formatting
-    df = df.drop('alleg_account_id', axis=1)
-    df = df.rename({'content_channel': 'Show', 'total_count': 'Views', 'genre': 'Genre'}, axis=1)   
-    
-    #group by Show and sort by Views
-    aggreg = {'Views': 'sum', 'Genre': lambda x: x.iloc[-1]}
-    df = df.groupby(['Show']).agg(aggreg)
+    df = df.rename({'alleg_account_id': 'ID', 'content_channel': 'Show', 'total_count': 'Views', 
+                    'genre': 'Genre'}, axis=1)   
+    df['ID'] = df['ID'].astype(str)
+    return df
+
+def rank_views(df):
+    """
+    Sorts shows by views, starting index at 1. 
+
+    Args:
+        df (pandas.DataFrame): with Show as index, and columns Views and Genre.
+
+    Returns:
+        pandas.Dataframe: with columns Show, Views and Genre, and index starting at 1.
+    """
     df = df.sort_values('Views', ascending=False)
     df = df.reset_index()
     df.index += 1 #start index at 1     
-   
     return df
 
-def get_save_views(df, input_file, date_start, date_end, title_append):
+def save_views(df_views, input_file, title_append):
     """
-    Creates a list of ids from df, invokes get_passport_views(), and saves views to output_dir. 
+    Saves ranked views to output_dir, next to input_file. 
 
     Args:
-        df (pandas.DataFrame): data from output/<directory>/assignments.csv.  
+        df_views (pandas.DataFrame): views from rank_views().  
         input_file (str): path to input file.
-        date_start (str): format is '2022-09-01'.
-        date_end (str): format is '2022-09-01' and is inclusive.
         title_append (str): gets appended to file name to make it unique, such as '_views_passport' 
 
     Returns:
         None.    
     """
-
-    ids = ','.join(str(x) for x in df['ID'])
-    df_views = get_passport_views(date_start, date_end, ids) 
     output_file = input_file.replace('assignments', title_append)
     df_views.to_csv(output_file)  
 
-def get_passport_views_per_group(name, input_file, date_start=PASSPORT_VIEWS_START, date_end=PASSPORT_VIEWS_END):
+def get_passport_views_per_group(
+    name, 
+    input_file, 
+    date_start=PASSPORT_VIEWS_START, 
+    date_end=PASSPORT_VIEWS_END, 
+    df=None
+):
     """
-    Uses name to fetch data file, and uses get_save_views() to get and save Passport views for all
-    Passport members, both globally and per each category or cluster if categories or clusters exist.
+    Uses name to fetch data file, and saves Passport views for all Passport members, both globally 
+    and per each category or cluster if categories or clusters exist. Views for all members are
+    queried once, and then totaled per group and show in one groupby.
 
     Args:
         name (str): name of data directory in file, output/<name>/assignments.csv.  
         input_file (str): path to inputfile, output/<name>/assignments.csv. 
         date_start (str): format is '2022-09-01'.
         date_end (str): format is '2022-09-01' and is inclusive.  
+        df (pandas.DataFrame): optional data already read from input_file.
     
     Returns:
         None.    
     """
     
-    df = pd.read_csv(input_file)
+    if df is None:
+        df = pd.read_csv(input_file)
     df = df[df['Passport'] == 1]
+
+    df_views = get_passport_views(date_start, date_end, df['ID'])
+    aggreg = {'Views': 'sum', 'Genre': lambda x: x.iloc[-1]}
       
     title_append = 'views' if name == 'passport_only' else 'views_all'
-    get_save_views(df, input_file, date_start, date_end, title_append)
+    save_views(rank_views(df_views.groupby('Show').agg(aggreg)), input_file, title_append)
 
+    groups = {}
     if name == 'passport_gifts' or name == 'new_donors':
-        for category in ['Passport', 'Both']:
-            df_category = df[df['Category'] == category] 
-            title_append = 'views_' + category.lower()
-            get_save_views(df_category, input_file, date_start, date_end, title_append)
+        group_col = 'Category'
+        groups = {category: 'views_' + category.lower() for category in ['Passport', 'Both']}
 
     if name == 'cluster':
-        for cluster in df['Cluster'].unique():
-            df_cluster = df[df['Cluster'] == cluster] 
-            title_append = 'views_' + str(cluster)
-            get_save_views(df_cluster, input_file, date_start, date_end, title_append)
+        group_col = 'Cluster'
+        groups = {cluster: 'views_' + str(cluster) for cluster in df['Cluster'].unique()}
+
+    if groups:
+        #add each member's group to their views, and total views per group and show
+        members = df.set_index(df['ID'].astype(str))[group_col]
+        members = members[~members.index.duplicated()]
+        df_views[group_col] = df_views['ID'].map(members)
+        df_groups = df_views.groupby([group_col, 'Show']).agg(aggreg)
+
+        for group, title_append in groups.items():
+            if group in df_groups.index.get_level_values(0):
+                df_group = df_groups.xs(group, level=group_col)
+            else:
+                df_group = df_groups.iloc[:0].droplevel(group_col)
+            save_views(rank_views(df_group), input_file, title_append)
 
 def main():
     arg = parse_args()
@@ -0,0 +1,199 @@
+import sqlite3
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+from src import PASSPORT_ID_BATCH_SIZE, PASSPORT_QUERY_WORKERS, PASSPORT_CACHE_SETTLE_DAYS
+
+#columns returned by the VPPA views query, and kept in the cache
+cols = ['alleg_account_id', 'content_channel', 'total_count', 'genre']
+
+def get_chunks(date_start, date_end):
+    """
+    Splits a date range into calendar months, with the first and last months clipped to the
+    range, so overlapping date ranges share the same cached months.
+
+    Args:
+        date_start (str): format is '2022-09-01'.
+        date_end (str): format is '2022-09-01' and is inclusive.
+
+    Returns:
+        List[tuple]: start and end dates of each month, with format '2022-09-01'.
+    """
+    start = pd.Timestamp(date_start)
+    end = pd.Timestamp(date_end)
+    chunks = []
+    for month in pd.period_range(start, end, freq='M'):
+        chunk_start = max(month.start_time.normalize(), start)
+        chunk_end = min(month.end_time.normalize(), end)
+        chunks.append((chunk_start.strftime('%Y-%m-%d'), chunk_end.strftime('%Y-%m-%d')))
+    return chunks
+
+def connect(cache_file):
+    """
+    Connects to the cache, creating its tables if they don't exist yet:
+        -views has views per account per show for each month
+        -coverage has each account and month already fetched, including accounts with no views
+
+    Args:
+        cache_file (str): path to SQLite cache file.
+
+    Returns:
+        sqlite3.Connection.
+    """
+    con = sqlite3.connect(cache_file)
+    con.execute('CREATE TABLE IF NOT EXISTS views '
+                '(id TEXT, start TEXT, end TEXT, show TEXT, views INTEGER, genre TEXT)')
+    con.execute('CREATE INDEX IF NOT EXISTS views_month ON views (start, end)')
+    con.execute('CREATE TABLE IF NOT EXISTS coverage '
+                '(id TEXT, start TEXT, end TEXT, PRIMARY KEY (start, end, id))')
+    return con
+
+def get_batches(ids, batch_size):
+    """
+    Splits ids into batches of at most batch_size, so queries stay the same size however many
+    members there are.
+
+    Args:
+        ids (List[str]): account ids.
+        batch_size (int): max number of ids per batch, with None for one batch.
+
+    Returns:
+        List[List[str]].
+    """
+    batch_size = batch_size or max(len(ids), 1)
+    return [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+
+def load_ids(con, ids):
+    """
+    Loads ids into a temporary table named ids, to join on in SQL instead of listing them in
+    statements.
+
+    Args:
+        con (sqlite3.Connection): database connection.
+        ids (List[str]): account ids.
+
+    Returns:
+        None.
+    """
+    con.execute('CREATE TEMP TABLE ids (id TEXT PRIMARY KEY)')
+    con.executemany('INSERT OR IGNORE INTO temp.ids VALUES (?)', [(x,) for x in ids])
+
+def get_cached_views(
+    date_start, 
+    date_end, 
+    ids, 
+    get_views, 
+    cache_file,
+    batch_size=PASSPORT_ID_BATCH_SIZE,
+    max_workers=PASSPORT_QUERY_WORKERS,
+    settle_days=PASSPORT_CACHE_SETTLE_DAYS
+):
+    """
+    Gets Passport views per member per show using a local cache, so only accounts and months
+    not fetched before are queried with get_views. Missing accounts are queried in batches of
+    at most batch_size ids per month, run concurrently in a thread pool. Months ending within
+    settle_days of today may still be getting views, so they are always queried and never saved
+    to the cache. Each source of views needs its own cache_file, so views from one aren't served
+    as cached for another. Delete cache_file to refetch everything.
+
+    Args:
+        date_start (str): format is '2022-09-01'.
+        date_end (str): format is '2022-09-01' and is inclusive.
+        ids (list-like): account ids, such as an ID column.
+        get_views (function): views query, taking date_start, date_end and a batch of ids with
+            format '1,2,3', such as VPPA.app.queries.get_channel_views_genres_members.
+        cache_file (str): path to SQLite cache file for get_views.
+        batch_size (int): max number of ids per query, with None to query all at once.
+        max_workers (int): max number of concurrent queries.
+        settle_days (int): days after a month ends before it is saved to the cache.
+
+    Returns:
+        pandas.Dataframe: with columns alleg_account_id, content_channel, total_count and genre,
+            the same as get_views.
+    """
+    ids = list(dict.fromkeys(str(x) for x in ids))
+    chunks = get_chunks(date_start, date_end)
+    settled = pd.Timestamp.today().normalize() - pd.Timedelta(days=settle_days)
+    settled = settled.strftime('%Y-%m-%d')
+    dfs = []
+
+    with closing(connect(cache_file)) as con:
+        load_ids(con, ids)
+        con.execute('CREATE TEMP TABLE months (start TEXT, end TEXT)')
+        con.executemany('INSERT INTO temp.months VALUES (?, ?)', chunks)
+
+        #accounts per month not in coverage, in the same order as ids
+        missing = {}
+        rows = con.execute('SELECT m.start, m.end, i.id FROM temp.months m CROSS JOIN temp.ids i '
+                           'LEFT JOIN coverage c ON c.start = m.start AND c.end = m.end '
+                           'AND c.id = i.id WHERE c.id IS NULL ORDER BY m.rowid, i.rowid')
+        for start, end, x in rows:
+            missing.setdefault((start, end), []).append(x)
+
+        jobs = [(start, end, batch) for (start, end), missing_ids in missing.items()
+                for batch in get_batches(missing_ids, batch_size)]
+        print('\nPASSPORT VIEWS QUERIES:', len(jobs))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(get_views, start, end, ','.join(batch)): (start, end, batch)
+                       for start, end, batch in jobs}
+
+            #save results as queries finish, with every account so empty ones are skipped
+            for future in as_completed(futures):
+                start, end, batch = futures[future]
+                df = future.result()[cols]
+                df = df.assign(alleg_account_id=df['alleg_account_id'].astype(str))
+
+                if end < settled:
+                    rows = df.set_axis(['id', 'show', 'views', 'genre'], axis=1)
+                    with con:
+                        rows.assign(start=start, end=end).to_sql('views', con, if_exists='append',
+                                                                 index=False)
+                        con.executemany('INSERT OR IGNORE INTO coverage VALUES (?, ?, ?)',
+                                        [(x, start, end) for x in batch])
+                else:
+                    dfs.append(df)
+
+        #finished months, now all cached, for only these accounts
+        df = pd.read_sql('SELECT v.id, v.show, v.views, v.genre FROM views v '
+                         'JOIN temp.months m ON v.start = m.start AND v.end = m.end '
+                         'JOIN temp.ids i ON v.id = i.id ORDER BY m.rowid', con)
+        df.columns = cols
+        dfs.append(df)
+
+    #total each account's views per show across months
+    df = pd.concat(dfs, ignore_index=True)
+    df = df.groupby(['alleg_account_id', 'content_channel'], sort=False, as_index=False).agg(
+        total_count=('total_count', 'sum'),
+        genre=('genre', 'last')
+    )
+    return df
+
+def get_local_views(date_start, date_end, ids, db_file):
+    """
+    Stand-in for the VPPA views query, for running and testing Passport views offline. Reads a
+    local SQLite database with a views table, with columns alleg_account_id, date, content_channel,
+    genre and total_count, and a row per account per show per day. Ids are taken as a list
+    instead of '1,2,3', and loaded into a temporary table and joined on.
+
+    Args:
+        date_start (str): format is '2022-09-01'.
+        date_end (str): format is '2022-09-01' and is inclusive.
+        ids (list-like): account ids.
+        db_file (str): path to SQLite database.
+
+    Returns:
+        pandas.Dataframe: with columns alleg_account_id, content_channel, total_count and genre.
+    """
+    with closing(sqlite3.connect(db_file)) as con:
+        load_ids(con, [str(x) for x in ids])
+        df = pd.read_sql('SELECT v.alleg_account_id, v.content_channel, v.total_count, v.genre '
+                         'FROM views v JOIN temp.ids i ON v.alleg_account_id = i.id '
+                         'WHERE v.date BETWEEN ? AND ?', con, params=(date_start, date_end))
+
+    df['alleg_account_id'] = df['alleg_account_id'].astype(str)
+    df = df.groupby(['alleg_account_id', 'content_channel'], sort=False, as_index=False).agg(
+        total_count=('total_count', 'sum'),
+        genre=('genre', 'last')
+    )
+    return df
@@ -2,43 +2,94 @@ import os
 import sys
 
 from src.helpers import get_data, get_output_dir
-from .helpers import parse_args, prep_data
+from .helpers import parse_args, parse_options, prep_data, fit_mini_batch, get_metrics
 
 import numpy as np
+import pandas as pd
 import matplotlib.pyplot as plt
+from joblib import Parallel, delayed, parallel_config
 from sklearn.cluster import KMeans
-from scipy.spatial.distance import cdist
 
-def create_elbow_plot(df, output_dir, clusters_elbow_method=range(1,10)):
+def get_scores(
+        X, 
+        k, 
+        kmeans_random_state=None, 
+        mini_batch=False, 
+        batch_size=4096, 
+        sample_size=2000
+    ):
     """
-    Runs iterations of model.predict(df) over a range of cluster=k to create an elbow plot of
-    average distances from observations. Saves plot to output_dir. 
+    Fits a k-means model with k clusters, and gets average distance of observations from their
+    assigned cluster centroids, along with other metrics from get_metrics(). Runs in a worker 
+    process for create_elbow_plot().
+
+    Args:
+        X (numpy.ndarray): standardized data.
+        k (int): number of clusters.
+        kmeans_random_state (int): seed for KMeans centroid initialization.
+        mini_batch (bool): whether to fit with fit_mini_batch() instead of full-batch KMeans.
+        batch_size (int): number of rows per mini-batch.
+        sample_size (int): number of rows per sample for sampled metrics.
+
+    Returns:
+        dict: metrics keyed on column names for the metrics table.
+    """
+    if mini_batch:
+        model, labels = fit_mini_batch(X, k, batch_size, random_state=kmeans_random_state)
+    else:
+        model = KMeans(n_clusters=k, random_state=kmeans_random_state)
+        model.fit(X)
+        labels = model.labels_
+
+    return get_metrics(X, model.cluster_centers_, labels, sample_size, 
+                       random_state=kmeans_random_state)
+
+def create_elbow_plot(
+        X, 
+        output_dir, 
+        clusters_elbow_method=range(1,10), 
+        n_jobs=-1, 
+        kmeans_random_state=None,
+        mini_batch=False,
+        batch_size=4096,
+        sample_size=2000
+    ):
+    """
+    Fits k-means models over a range of cluster=k, in parallel across cores, to create an elbow 
+    plot of average distances from observations. Saves plot to output_dir, along with a table of 
+    metrics per k as metrics.csv. 
     
     Args:
-        df (pandas.DataFrame): standardized data, transformed from data/processed/<NAME>-donors.csv.   
+        X (numpy.ndarray): standardized float32 data from prep_data().   
         output_dir (str): path to output directory. 
         clusters_elbow_method (range): range of number of clusters to iterate over.
+        n_jobs (int): number of worker processes, with -1 using all cores.
+        kmeans_random_state (int): seed for KMeans centroid initialization.
+        mini_batch (bool): whether to fit with fit_mini_batch() instead of full-batch KMeans.
+        batch_size (int): number of rows per mini-batch.
+        sample_size (int): number of rows per sample for silhouette and gap statistic, which 
+            would otherwise compare every pair of rows or refit on full-size reference data.
         
     Returns:
         None.    
     """
 
-    #k-means cluster analysis using Elbow Method
-    mean_dist = []
+    #k-means cluster analysis using Elbow Method, with one thread per worker process so
+    #KMeans threads don't multiply across workers
+    with parallel_config(backend='loky', inner_max_num_threads=1):
+        scores = Parallel(n_jobs=n_jobs)(
+            delayed(get_scores)(X, k, kmeans_random_state, mini_batch, batch_size, sample_size) 
+            for k in clusters_elbow_method
+        )
 
-    for k in clusters_elbow_method:
-        model = KMeans(n_clusters=k)
-        model.fit(df)
-        assign = model.predict(df)
-        mean_dist.append(
-            sum(np.min(cdist(df, model.cluster_centers_, 
-            'euclidean'), axis=1)) / df.shape[0]
-            )
+    df_metrics = pd.DataFrame(scores)
+    df_metrics.to_csv(os.path.join(output_dir, 'metrics.csv'), index=False)
+    print('\n', df_metrics)
 
     #plot average distance from observations from the cluster centroid
     #to use the Elbow Method to identify number of clusters to choose
     plt.rcParams["figure.figsize"] = [9.0, 6.0]
-    plt.plot(clusters_elbow_method, mean_dist)
+    plt.plot(clusters_elbow_method, df_metrics['Mean_Distance'])
     plt.xlabel('Number of Clusters')
     plt.ylabel('Average Distance')
     plt.title('Selecting K with the Elbow Method')    
@@ -48,12 +99,18 @@ def create_elbow_plot(df, output_dir, clusters_elbow_method=range(1,10)):
     
 def main():
     args = parse_args()
+    options = parse_options()
     range_end = args[0] + 1 if len(args) > 0 else 10
 
     df = get_data()
-    df_std = prep_data(df)
+    X = prep_data(df)
     output_dir = get_output_dir('cluster')
-    create_elbow_plot(df_std, output_dir, clusters_elbow_method=range(1,range_end))
+    create_elbow_plot(X, 
+                      output_dir, 
+                      clusters_elbow_method=range(1,range_end),
+                      kmeans_random_state=options['kmeans_random_state'],
+                      mini_batch=options['mini_batch'],
+                      batch_size=options['batch_size'])
 
 if __name__ == '__main__':
     sys.exit(main())
@@ -1,16 +1,61 @@
 import os
 import argparse
+import joblib
+import numpy as np
+import pandas as pd
 import matplotlib.pyplot as plt
+import matplotlib.colors as mcolors
 from sklearn import preprocessing
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import (
+    adjusted_rand_score, 
+    silhouette_score, 
+    calinski_harabasz_score, 
+    davies_bouldin_score
+)
+from scipy.optimize import linear_sum_assignment
+from scipy.spatial.distance import cdist
+from src import DATA_MODELS_DIR
+
+def get_parser():
+    """
+    Gets command-line parser for cluster modules, used by parse_args() and parse_options().
+    Modules with their own options add them to this parser.
+
+    Returns:
+        argparse.ArgumentParser.
+    """
+    parser = argparse.ArgumentParser(description='Run cluster module')
+    parser.add_argument(
+        'arg_values',
+        nargs='*',
+        type=int,
+        help='Specify a range using one or two numbers, with each inclusive, e.g. 4 or 4 6'
+    )
+    parser.add_argument(
+        '--mini-batch',
+        action='store_true',
+        help='Fit k-means in mini-batches streamed from the data, for large donor files'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=4096,
+        help='Number of rows per mini-batch, defaults to 4096'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=None,
+        help='Seed for k-means centroid initialization, so results and saved models can be reused'
+    )
+    return parser
 
-def parse_args():
+def parse_args(parser=None):
     """
     Parses command-line arguments to add as arguments to cluster functions. Options include 
     one, two or no integers. 
 
-    Returns:
-        List[int]: list of 0 or more integers provided as command-line arguments. 
-
     Examples:
         Run with no values:
             $ python -m src.cluster.kmeans 
@@ -22,45 +67,385 @@ def parse_args():
         Run with two values to set range, with each number inclusive: 
             $ python -m src.cluster.pca_plots 3 5 
 
+    Args:
+        parser (argparse.ArgumentParser): parser from get_parser() with a module's own options 
+            added, with None for get_parser().
+
     Returns:
         List[int]: list of integers specified by user, which can represent a range.          
     """
-    parser = argparse.ArgumentParser(description='Run cluster module')
-    parser.add_argument(
-        'arg_values',
-        nargs='*',
-        type=int,
-        help='Specify a range using one or two numbers, with each inclusive, e.g. 4 or 4 6'
-    )
-    args = parser.parse_args()
+    args = (parser or get_parser()).parse_args()
     return args.arg_values
 
-def prep_data(
+def parse_options(parser=None):
+    """
+    Parses optional command-line flags shared by cluster functions.
+
+    Examples:
+        $ python -m src.cluster.kmeans 4 --mini-batch
+        $ python -m src.cluster.kmeans 4 --mini-batch --batch-size 10000
+        $ python -m src.cluster.elbow_plot 15 --mini-batch
+        $ python -m src.cluster.kmeans 4 --seed 42
+
+    Args:
+        parser (argparse.ArgumentParser): parser from get_parser() with a module's own options 
+            added, with None for get_parser().
+
+    Returns:
+        dict: with mini_batch, batch_size and kmeans_random_state keys.
+    """
+    args = (parser or get_parser()).parse_args()
+    return {
+        'mini_batch': args.mini_batch, 
+        'batch_size': args.batch_size, 
+        'kmeans_random_state': args.seed
+    }
+
+def get_matrix(df, cols):
+    """
+    Copies columns from dataframe into one contiguous float32 matrix, a column at a time, so 
+    there's no intermediate float64 copy of the data.
+
+    Arg:
+        df (pandas.DataFrame): data from data/processed/<NAME>-donors.csv.   
+        cols (List[str]): columns to copy, in order.             
+
+    Returns:
+        numpy.ndarray: with a row per donor and a column per column in cols.
+    """
+    X = np.empty((len(df), len(cols)), dtype=np.float32)
+    for i, col in enumerate(cols):
+        X[:, i] = df[col].to_numpy()
+    return X
+
+def fit_scaler(
         df,
         cols_to_drop=['ID', 'Status', 'Total_Count', 'Total_Payments', 'Num_Years']
     ):
     """
-    Drops unneeded columns, and standardizes predictors to mean=0 and std=1.
+    Fits a scaler that standardizes predictors to mean=0 and std=1, so the same standardization
+    can be saved with a cluster model and applied to new donors.
+
+    Arg:
+        df (pandas.DataFrame): data from data/processed/<NAME>-donors.csv.   
+        cols_to_drop (List[str]): columns to drop from dataframe.             
+
+    Returns:
+        sklearn.preprocessing.StandardScaler: fitted on predictor columns, with means in mean_, 
+            stds in scale_ and column names in feature_names_in_.
+    """
+    cols = [col for col in df.columns if col not in cols_to_drop]
+    scaler = preprocessing.StandardScaler().fit(get_matrix(df, cols))
+
+    #fit on matrix to save memory, so column names are set here
+    scaler.feature_names_in_ = np.array(cols, dtype=object)
+    return scaler
+
+def prep_data(
+        df,
+        cols_to_drop=['ID', 'Status', 'Total_Count', 'Total_Payments', 'Num_Years'],
+        scaler=None
+    ):
+    """
+    Drops unneeded columns, and standardizes predictors to mean=0 and std=1, using the means and
+    stds kept by the fitted scaler. Builds one contiguous float32 matrix and standardizes it in 
+    place, so KMeans, PCA and distance functions can all use it without copying.
 
     Arg:
         df (pandas.DataFrame): data from data/processed/<NAME>-donors.csv.   
         cols_to_drop (List[str]): columns to drop from dataframe.             
+        scaler (sklearn.preprocessing.StandardScaler): fitted scaler from fit_scaler(), or None 
+            to standardize using df itself.
 
     Returns:
-        pandas.DataFrame.
+        numpy.ndarray: standardized data, with a row per donor and a column per predictor in 
+            order of scaler.feature_names_in_.
     """
+    if scaler is None:
+        scaler = fit_scaler(df, cols_to_drop)
+
     #drop variables to leave out    
-    df = df.drop(cols_to_drop, axis=1)
+    X = get_matrix(df, scaler.feature_names_in_)
 
     print('\n', df.tail)
 
     #standardize predictors to mean=0 and std=1 
-    for col in df.columns:
-        df[col] = preprocessing.scale(df[col].astype('float64'))
+    X -= scaler.mean_.astype(np.float32)
+    X /= scaler.scale_.astype(np.float32)
+    return X
+
+def get_model_path(data_hash, k, random_state, mini_batch=False, models_dir=DATA_MODELS_DIR):
+    """
+    Gets path to a saved cluster model, keyed on the data it was fit on, number of clusters, 
+    seed and whether it was fit in mini-batches.
+
+    Args:
+        data_hash (str): hash of data from data/processed/<NAME>-donors.csv.
+        k (int): number of clusters.
+        random_state (int): seed for KMeans centroid initialization.
+        mini_batch (bool): whether model was fit with fit_mini_batch().
+        models_dir (str): path to directory of saved models.
+
+    Returns:
+        str: path to model file.
+    """
+    name = f'kmeans-{data_hash[:16]}-k{k}-seed{random_state}'
+    if mini_batch: 
+        name += '-mini-batch'
+    return os.path.join(models_dir, name + '.joblib')
+
+def save_model(path, model, scaler):
+    """
+    Saves a fitted cluster model along with the scaler used to standardize its data.
+
+    Args:
+        path (str): path from get_model_path().
+        model (sklearn.cluster.KMeans): fitted KMeans or MiniBatchKMeans model.
+        scaler (sklearn.preprocessing.StandardScaler): fitted scaler from fit_scaler().
+
+    Returns:
+        None.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    joblib.dump({'model': model, 'scaler': scaler}, path)
+    print('\nSAVED MODEL:', path)
+
+def load_model(path):
+    """
+    Loads a cluster model saved by save_model().
+
+    Args:
+        path (str): path to model file.
+
+    Returns:
+        dict: with 'model' and 'scaler' keys.
+    """
+    print('\nLOADING MODEL:', path)
+    return joblib.load(path)
+
+def mean_distance(X, centers, labels, chunk_size=100000):
+    """
+    Gets average euclidean distance of observations from their assigned cluster centroids, 
+    working through rows in chunks instead of building a full matrix of distances to every 
+    centroid.
+
+    Args:
+        X (numpy.ndarray): standardized data, with a row per observation.
+        centers (numpy.ndarray): cluster centroids, with a row per cluster.
+        labels (numpy.ndarray): cluster assignment for each row in X.
+        chunk_size (int): number of rows to work on at a time.
+
+    Returns:
+        float: average distance.
+    """
+    total = 0.0
+    for start in range(0, X.shape[0], chunk_size):
+        end = start + chunk_size
+        diff = X[start:end] - centers[labels[start:end]]
+        #sum in float64, since float32 sums lose precision over millions of rows
+        total += float(np.sqrt(np.einsum('ij,ij->i', diff, diff, dtype=np.float64)).sum())
+
+    return total / X.shape[0]
+
+def fit_mini_batch(X, k, batch_size=4096, n_epochs=10, random_state=None, chunk_size=100000):
+    """
+    Fits a mini-batch k-means model by streaming shuffled batches of rows from X into 
+    MiniBatchKMeans.partial_fit(), so each step only works on batch_size rows, and then 
+    assigns clusters in chunks.
+
+    Args:
+        X (numpy.ndarray): standardized data.
+        k (int): number of clusters.
+        batch_size (int): number of rows per mini-batch.
+        n_epochs (int): number of passes over X.
+        random_state (int): seed for batch shuffling and centroid initialization.
+        chunk_size (int): number of rows to assign clusters to at a time.
+
+    Returns:
+        tuple: fitted MiniBatchKMeans model, and numpy.ndarray of cluster assignments.
+    """
+    n = X.shape[0]
+    rng = np.random.default_rng(random_state)
+    model = MiniBatchKMeans(n_clusters=k, batch_size=batch_size, random_state=random_state)
+
+    for epoch in range(n_epochs):
+        for batch in np.array_split(rng.permutation(n), max(1, n // batch_size)):
+            model.partial_fit(X[batch])
+
+    labels = np.concatenate([model.predict(X[start:start + chunk_size]) 
+                             for start in range(0, n, chunk_size)])
+    return model, labels
+
+def compare_to_full_batch(X, centers, labels, kmeans_n_init=30, kmeans_random_state=None):
+    """
+    Fits a full-batch k-means model, matches its clusters to mini-batch clusters by closest 
+    centroids, and reports how closely centroids and assignments match.
+
+    Args:
+        X (numpy.ndarray): standardized data.
+        centers (numpy.ndarray): mini-batch cluster centroids.
+        labels (numpy.ndarray): mini-batch cluster assignments.
+        kmeans_n_init (int): how many times full-batch KMeans runs with different centroid seeds.
+        kmeans_random_state (int): seed for full-batch KMeans centroid initialization.
+
+    Returns:
+        str: report of centroid distances, assignment agreement and adjusted Rand index.
+    """
+    k = centers.shape[0]
+    model = KMeans(n_clusters=k, n_init=kmeans_n_init, random_state=kmeans_random_state)
+    model.fit(X)
+
+    #pair each mini-batch cluster with a full-batch cluster, minimizing centroid distances
+    distances = cdist(centers, model.cluster_centers_, 'euclidean')
+    rows, cols = linear_sum_assignment(distances)
+    matched = np.empty(k, dtype='int64')
+    matched[rows] = cols
+
+    agreement = np.mean(matched[labels] == model.labels_)
+    output = f'Mini-batch vs. full-batch k-means for {k} clusters\n\n'
+    output += 'Centroid distances (standardized units)\n'
+    for row, col in zip(rows, cols):
+        output += f'  mini-batch {row} -> full-batch {col}: {distances[row, col]:.4f}\n'
+    output += f'\nMean centroid distance: {distances[rows, cols].mean():.4f}'
+    output += f'\nAssignment agreement: {agreement:.2%}'
+    output += f'\nAdjusted Rand index: {adjusted_rand_score(model.labels_, labels):.4f}'
+
+    print('\n' + output)
+    return output
+
+def sample_stratified(labels, sample_size, rng):
+    """
+    Draws a sample of row indices, with each cluster represented in proportion to its size and
+    by at least one row.
+
+    Args:
+        labels (numpy.ndarray): cluster assignment for each row.
+        sample_size (int): number of rows to draw, with all rows returned if there are fewer.
+        rng (numpy.random.Generator): random number generator.
+
+    Returns:
+        numpy.ndarray: row indices.
+    """
+    if len(labels) <= sample_size:
+        return np.arange(len(labels))
+
+    clusters, counts = np.unique(labels, return_counts=True)
+    sizes = np.round(counts / counts.sum() * sample_size).astype(int)
+    sizes = np.minimum(np.maximum(sizes, 1), counts)
+    return np.concatenate([
+        rng.choice(np.flatnonzero(labels == cluster), size, replace=False)
+        for cluster, size in zip(clusters, sizes)
+    ])
+
+def sample_silhouette(X, labels, sample_size=2000, n_samples=10, rng=None):
+    """
+    Estimates silhouette score from repeated stratified samples, since the exact score compares 
+    every pair of rows. Returns the mean score with a 95% confidence interval.
+
+    Args:
+        X (numpy.ndarray): standardized data.
+        labels (numpy.ndarray): cluster assignment for each row in X.
+        sample_size (int): number of rows per sample.
+        n_samples (int): number of samples to draw.
+        rng (numpy.random.Generator): random number generator.
+
+    Returns:
+        tuple: mean, lower and upper bound, or NaNs if there is only one cluster.
+    """
+    if len(np.unique(labels)) < 2:
+        return np.nan, np.nan, np.nan
+
+    #exact score when all rows fit in one sample
+    if len(labels) <= sample_size:
+        score = silhouette_score(X, labels)
+        return score, score, score
+
+    rng = np.random.default_rng(rng)
+    scores = []
+    for _ in range(n_samples):
+        idx = sample_stratified(labels, sample_size, rng)
+        scores.append(silhouette_score(X[idx], labels[idx]))
+
+    mean = np.mean(scores)
+    margin = 1.96 * np.std(scores, ddof=1) / np.sqrt(n_samples)
+    return mean, mean - margin, mean + margin
+
+def gap_statistic(X, centers, labels, sample_size=2000, n_refs=5, rng=None):
+    """
+    Gets gap statistic, comparing how tight clusters are against clusters fit to uniformly 
+    random reference data over the same range. Works on a sample of rows, with reference data 
+    of the same size, so reference fits stay fast on large donor files. 
+
+    Args:
+        X (numpy.ndarray): standardized data.
+        centers (numpy.ndarray): cluster centroids, with a row per cluster.
+        labels (numpy.ndarray): cluster assignment for each row in X.
+        sample_size (int): number of rows to sample, and to generate per reference data set.
+        n_refs (int): number of reference data sets.
+        rng (numpy.random.Generator): random number generator.
+
+    Returns:
+        tuple: gap and its standard error.
+
+    Reference: Tibshirani, Walther and Hastie, Estimating the number of clusters in a data set 
+    via the gap statistic, 2001.
+    """
+    rng = np.random.default_rng(rng)
+    idx = rng.choice(len(X), min(len(X), sample_size), replace=False)
+    diff = X[idx] - centers[labels[idx]]
+    log_w = np.log(np.einsum('ij,ij->', diff, diff))
+
+    mins, maxs = X.min(axis=0), X.max(axis=0)
+    ref_log_w = []
+    for _ in range(n_refs):
+        ref = rng.uniform(mins, maxs, size=(len(idx), X.shape[1]))
+        model = KMeans(n_clusters=len(centers), n_init=1, random_state=rng.integers(2**31 - 1))
+        model.fit(ref)
+        ref_log_w.append(np.log(model.inertia_))
+
+    gap = np.mean(ref_log_w) - log_w
+    return gap, np.std(ref_log_w) * np.sqrt(1 + 1 / n_refs)
+
+def get_metrics(X, centers, labels, sample_size=2000, n_samples=10, random_state=None):
+    """
+    Gets metrics to select number of clusters with: average distance from centroids, sampled 
+    silhouette with confidence interval, Calinski-Harabasz, Davies-Bouldin and gap statistic. 
+    Metrics that need at least two clusters are NaN for one cluster.
 
-    return df
+    Args:
+        X (numpy.ndarray): standardized data.
+        centers (numpy.ndarray): cluster centroids, with a row per cluster.
+        labels (numpy.ndarray): cluster assignment for each row in X.
+        sample_size (int): number of rows per sample for silhouette and gap statistic.
+        n_samples (int): number of samples to estimate silhouette from.
+        random_state (int): seed for sampling.
+
+    Returns:
+        dict: metrics keyed on column names for the metrics table.
+    """
+    k = len(centers)
+    seed = None if random_state is None else [random_state, k]
+    rng = np.random.default_rng(seed)
+
+    silhouette, silhouette_low, silhouette_high = sample_silhouette(
+        X, labels, sample_size, n_samples, rng
+    )
+    gap, gap_sd = gap_statistic(X, centers, labels, sample_size, rng=rng)
+    multiple = len(np.unique(labels)) > 1
+
+    return {
+        'Clusters': k,
+        'Mean_Distance': mean_distance(X, centers, labels),
+        'Silhouette': silhouette,
+        'Silhouette_CI_Low': silhouette_low,
+        'Silhouette_CI_High': silhouette_high,
+        'Calinski_Harabasz': calinski_harabasz_score(X, labels) if multiple else np.nan,
+        'Davies_Bouldin': davies_bouldin_score(X, labels) if multiple else np.nan,
+        'Gap': gap,
+        'Gap_SD': gap_sd
+    }
 
-def merge_cluster_labels(df, ser_cluster_labels, output_dir):
+def merge_cluster_labels(df, ser_cluster_labels, output_dir, ser_confidence=None):
     """
     Adds column of cluster labels to dataframe, checks frequencies, aggregates clusters, 
     calculates cluster averages, and saves results to output_dir.
@@ -69,6 +454,7 @@ def merge_cluster_labels(df, ser_cluster_labels, output_dir):
         df (pandas.DataFrame): data from data/processed/donors.csv.  
         ser_cluster_labels (pandas.Series): column of cluster label numbers to add to df. 
         output_dir (str): path to output directory.            
+        ser_confidence (pandas.Series): optional column of assignment confidence to add to df.
 
     Returns:
         pandas.DataFrame: cluster averages across columns.
@@ -76,6 +462,8 @@ def merge_cluster_labels(df, ser_cluster_labels, output_dir):
 
     #merge cluster assignments with data
     df['Cluster'] = ser_cluster_labels
+    if ser_confidence is not None:
+        df['Confidence'] = ser_confidence
 
     #print('\n', df)
 
@@ -134,6 +522,49 @@ def merge_cluster_labels(df, ser_cluster_labels, output_dir):
 
     return groups
 
+def plot_cluster_density(plot_columns, labels, clusters_num, output_dir, gridsize=80):
+    """
+    Plots 2D projection of clusters, such as from PCA, as a grid of bins instead of a point per 
+    donor, so render time and png size stay the same as the number of donors grows. Each bin is 
+    colored by the cluster with the most donors in it, and shaded by how many donors it holds.
+    Saves png to output_dir as model_<number of clusters>.png.
+
+    Args:
+        plot_columns (numpy.ndarray): 2 columns of projected data, one row per donor.  
+        labels (array-like): cluster assignment per donor.  
+        clusters_num (int): number of clusters, with a max of 7 because of the color map.  
+        output_dir (str): path to output directory.             
+        gridsize (int): number of bins along each axis.
+
+    Returns:
+        None.
+    """ 
+
+    #set color map for bins
+    #reference: https://stackoverflow.com/questions/36180477/assigning-custom-colors-to-clusters-using-numpy
+    colors = {0:'r', 1:'b', 2:'g', 3:'y', 4:'m', 5:'c', 6:'k'}
+    labels = np.asarray(labels)
+
+    #count donors per cluster per bin in one pass
+    mins = plot_columns.min(axis=0)
+    spans = np.maximum(plot_columns.max(axis=0) - mins, np.finfo(float).eps)
+    bins = np.minimum(((plot_columns - mins) / spans * gridsize).astype(int), gridsize - 1)
+    flat = (labels * gridsize + bins[:, 1]) * gridsize + bins[:, 0]
+    counts = np.bincount(flat, minlength=clusters_num * gridsize * gridsize)
+    counts = counts.reshape(clusters_num, gridsize, gridsize)
+
+    #color bins by dominant cluster, and shade on log scale of total donors
+    totals = counts.sum(axis=0)
+    rgba = np.array([mcolors.to_rgba(colors[i]) for i in range(clusters_num)])[counts.argmax(axis=0)]
+    rgba[..., 3] = np.log1p(totals) / np.log1p(totals.max())
+
+    plt.imshow(rgba, origin='lower', aspect='auto', interpolation='nearest',
+               extent=(mins[0], mins[0] + spans[0], mins[1], mins[1] + spans[1]))
+    plt.xlabel('Canonical Variable 1')
+    plt.ylabel('Canonical Variable 2')
+    plt.title('Scatterplot of Canonical Variables for ' + str(clusters_num) + ' clusters')        
+    plt.savefig(os.path.join(output_dir, 'model_' + str(clusters_num) + '.png'), dpi=72)
+
 def plot_cluster_sizes(df, output_dir):
     """
     Plots the "Frequencies" column in provided df, and saves png to output_dir.
@@ -2,60 +2,104 @@ import os
 import sys
 
 from src.helpers import get_data, get_output_dir
+from src.process.cache import hash_frame
 from .helpers import (
+    get_parser,
     parse_args,
+    parse_options,
+    fit_scaler,
     prep_data,
+    get_model_path,
+    save_model,
+    load_model,
+    fit_mini_batch,
+    compare_to_full_batch,
+    plot_cluster_density,
     merge_cluster_labels, 
     plot_cluster_sizes
 )
 
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from sklearn.cluster import KMeans
 from sklearn.decomposition import PCA 
 
 def run_kmeans(
-        df,
+        X,
         output_dir,
         clusters_pca_scatterplots=range(4,5),
         kmeans_n_init=30,
-        kmeans_random_state=None        
+        kmeans_random_state=None,
+        mini_batch=False,
+        batch_size=4096,
+        compare=False,
+        scaler=None,
+        data_hash=None        
     ):    
     """
-    Runs a k-means cluster analysis on a pandas.DataFrame from data/processed/donors.csv, uses
-    PCA scatterplot/s to interpret solution/s, and saves plot/s to output_dir. 
+    Runs a k-means cluster analysis on standardized data from data/processed/donors.csv, uses
+    PCA scatterplot/s, binned by density, to interpret solution/s, and saves plot/s to output_dir.
+    The PCA projection is fit once and shared across numbers of clusters. If scaler and 
+    data_hash are set, fitted models are saved with the scaler, and a saved model for the same 
+    data, clusters and seed is reused instead of refitting.
     
     Args:
-        df (pandas.DataFrame): data from data/processed/<NAME>-donors.csv.   
+        X (numpy.ndarray): standardized float32 data from prep_data().   
         output_dir (str): path to output directory. 
         clusters_pca_scatterplots (range): range of number of clusters to interpret using PCA 
             scatterplots. Because of the color map, the max number of clusters is 7. 
         kmeans_n_init (int): how many times KMeans runs with different initial centroid seeds. 
+        kmeans_random_state (int): seed for KMeans centroid initialization.
+        mini_batch (bool): whether to fit with fit_mini_batch() instead of full-batch KMeans.
+        batch_size (int): number of rows per mini-batch.
+        compare (bool): with mini_batch, also fit full-batch KMeans and save a report of how 
+            closely they match to mini_batch_<k>.txt.
+        scaler (sklearn.preprocessing.StandardScaler): fitted scaler from fit_scaler() that 
+            standardized X, to save with models.
+        data_hash (str): hash of unstandardized data, to key saved models on.
         
     Returns:
         pandas.Series: column of numbered cluster assignments.    
     """
 
-    #set color map for scatterplot/s
-    #reference: https://stackoverflow.com/questions/36180477/assigning-custom-colors-to-clusters-using-numpy
-    colors = {0:'r', 1:'b', 2:'g', 3:'y', 4:'m', 5:'c', 6:'k'}
-    plt.xlabel('Canonical Variable 1')
-    plt.ylabel('Canonical Variable 2')
+    #project data once, since it's the same for each number of clusters
+    pca_2 = PCA(2)
+    plot_columns = pca_2.fit_transform(X)   
         
     #interpret cluster solution using PCA scatterplots
     for x in clusters_pca_scatterplots:
-        model = KMeans(n_clusters=x, n_init=kmeans_n_init, random_state=kmeans_random_state)
-        model.fit(df)
-        model.predict(df)
-        ser_cluster_labels = pd.Series(model.labels_)
+        path = None
+        if scaler is not None and data_hash:
+            path = get_model_path(data_hash, x, kmeans_random_state, mini_batch)
+
+        #reuse saved model, which is only reproducible if a seed is set
+        if path and kmeans_random_state is not None and os.path.isfile(path):
+            model = load_model(path)['model']
+            labels = model.predict(X)
+
+        else:
+            if mini_batch:
+                model, labels = fit_mini_batch(X, x, batch_size, random_state=kmeans_random_state)
+            else:
+                model = KMeans(n_clusters=x, n_init=kmeans_n_init, random_state=kmeans_random_state)
+                model.fit(X)
+                model.predict(X)
+                labels = model.labels_
+
+            if path and kmeans_random_state is not None: 
+                save_model(path, model, scaler)
+
+        if mini_batch and compare:
+            output = compare_to_full_batch(X, model.cluster_centers_, labels, 
+                                           kmeans_n_init, kmeans_random_state)
+            with open(os.path.join(output_dir, 'mini_batch_' + str(x) + '.txt'), 'w') as f: 
+                f.write(output)
+
+        ser_cluster_labels = pd.Series(labels)
         
-        #plot clusters    
-        pca_2 = PCA(2)
-        plot_columns = pca_2.fit_transform(df)   
-        plt.scatter(x=plot_columns[:,0], y=plot_columns[:,1], c=ser_cluster_labels.map(colors),
-                    s=25, alpha=0.1, edgecolor='none')
-        plt.title('Scatterplot of Canonical Variables for ' + str(x) + ' clusters')        
-        plt.savefig(os.path.join(output_dir, 'model_' + str(x) + '.png'), dpi=72)
+        #plot clusters as binned density
+        plot_cluster_density(plot_columns, labels, x, output_dir)
         plt.show()
         plt.clf()
         
@@ -66,18 +110,43 @@ def run_kmeans(
 
     return ser_cluster_labels
     
+def get_kmeans_parser():
+    """
+    Gets command-line parser for cluster modules, with a --compare option for kmeans.
+
+    Examples:
+        $ python -m src.cluster.kmeans 4 --mini-batch --compare
+
+    Returns:
+        argparse.ArgumentParser.
+    """
+    parser = get_parser()
+    parser.add_argument(
+        '--compare',
+        action='store_true',
+        help='With --mini-batch, also fit full-batch k-means and report how closely they match'
+    )
+    return parser
+
 def main():
-    args = parse_args()
+    parser = get_kmeans_parser()
+    args = parse_args(parser)
+    options = parse_options(parser)
+    options['compare'] = parser.parse_args().compare
     range_start = args[0] if len(args) > 0 else 4
     range_end = range_start + 1
 
     df = get_data()
-    df_std = prep_data(df)
+    scaler = fit_scaler(df)
+    X = prep_data(df, scaler=scaler)
     output_dir = get_output_dir('cluster')
 
-    ser_cluster_labels = run_kmeans(df_std, 
+    ser_cluster_labels = run_kmeans(X, 
                                     output_dir, 
-                                    clusters_pca_scatterplots=range(range_start,range_end))
+                                    clusters_pca_scatterplots=range(range_start,range_end),
+                                    scaler=scaler,
+                                    data_hash=hash_frame(df),
+                                    **options)
     
     df_groups = merge_cluster_labels(df, ser_cluster_labels, output_dir)
     plot_cluster_sizes(df_groups, output_dir)
@@ -1,6 +1,6 @@
 import sys
 from src.helpers import get_data, get_output_dir
-from .helpers import parse_args, prep_data
+from .helpers import parse_args, parse_options, prep_data
 from .kmeans import run_kmeans
 
 def set_range(args, max):
@@ -44,12 +44,13 @@ def set_range(args, max):
    
 def main():
     args = parse_args()
+    options = parse_options()
     clusters_range = set_range(args, 7) 
 
     df = get_data()
-    df_std = prep_data(df)
+    X = prep_data(df)
     output_dir = get_output_dir('cluster')
-    run_kmeans(df_std, output_dir, clusters_pca_scatterplots=clusters_range)
+    run_kmeans(X, output_dir, clusters_pca_scatterplots=clusters_range, **options)
 
 if __name__ == '__main__':
     sys.exit(main())
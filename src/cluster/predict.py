@@ -0,0 +1,91 @@
+import os
+import sys
+import glob
+import argparse
+
+from src import DATA_PROCESSED_DIR, DATA_MODELS_DIR
+from src.helpers import get_output_dir
+from .helpers import prep_data, load_model, merge_cluster_labels, plot_cluster_sizes
+
+import pandas as pd
+
+def parse_args():
+    """
+    Parses command-line arguments for name of processed donors file to assign clusters to, and
+    optional name of saved model in data/processed/models/, which defaults to the latest.
+
+    Examples:
+        $ python -m src.cluster.predict donors-new-acquisitions.csv
+        $ python -m src.cluster.predict donors-new-acquisitions.csv --model kmeans-<hash>-k4-seed42.joblib
+
+    Returns:
+        tuple: filename and model name specified by the user, with model name None if omitted.
+    """
+    parser = argparse.ArgumentParser(description='Run cluster predict module')
+    parser.add_argument(
+        'filename',
+        type=str,
+        help='Specify name of processed donors csv file in data/processed/ to assign clusters to'
+    )
+    parser.add_argument(
+        '--model',
+        type=str,
+        default=None,
+        help='Specify name of saved model in data/processed/models/, defaults to latest'
+    )
+    args = parser.parse_args()
+    return args.filename, args.model
+
+def get_latest_model(models_dir=DATA_MODELS_DIR):
+    """
+    Gets path to most recently saved model in models_dir.
+
+    Arg:
+        models_dir (str): path to directory of saved models.
+
+    Returns:
+        str: path to model file, or None if there are no saved models.
+    """
+    paths = glob.glob(os.path.join(models_dir, '*.joblib'))
+    return max(paths, key=os.path.getmtime) if paths else None
+
+def predict(df, model_file, output_dir):
+    """
+    Assigns donors in df to clusters of a saved model, standardizing them with the saved scaler
+    instead of refitting, and saves assignments.csv, groups.csv and frequencies plot to output_dir.
+
+    Args:
+        df (pandas.DataFrame): data in same format as data/processed/<NAME>-donors.csv.
+        model_file (str): path to model saved by src.cluster.kmeans.
+        output_dir (str): path to output directory.
+
+    Returns:
+        pandas.Series: column of numbered cluster assignments.
+    """
+    saved = load_model(model_file)
+    model = saved['model']
+    X = prep_data(df, scaler=saved['scaler'])
+    ser_cluster_labels = pd.Series(model.predict(X))
+
+    df_groups = merge_cluster_labels(df, ser_cluster_labels, output_dir)
+    plot_cluster_sizes(df_groups, output_dir)
+    return ser_cluster_labels
+
+def main():
+    filename, model_name = parse_args()
+    path = filename if os.path.isfile(filename) else os.path.join(DATA_PROCESSED_DIR, filename)
+    model_file = os.path.join(DATA_MODELS_DIR, model_name) if model_name else get_latest_model()
+
+    if not os.path.isfile(path):
+        print('\nFile does not exist:\n', '  ', path)
+
+    elif not model_file or not os.path.isfile(model_file):
+        print('\nNo saved model, run src.cluster.kmeans first')
+
+    else:
+        df = pd.read_csv(path)
+        output_dir = get_output_dir('cluster_predict')
+        predict(df, model_file, output_dir)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+import os
+import sys
+
+from src.helpers import get_data, get_output_dir
+from src.process.cache import hash_frame
+from .helpers import (
+    get_parser,
+    parse_args,
+    parse_options,
+    fit_scaler,
+    prep_data,
+    fit_mini_batch,
+    merge_cluster_labels,
+    plot_cluster_sizes
+)
+from .kmeans import run_kmeans
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed, parallel_config
+from scipy.optimize import linear_sum_assignment
+from sklearn.cluster import KMeans
+
+def fit_bootstrap(
+        X,
+        labels,
+        k,
+        seed,
+        kmeans_n_init=30,
+        mini_batch=False,
+        batch_size=4096
+    ):
+    """
+    Refits k-means on a bootstrap resample of X, and compares it to the reference clusters.
+    Runs in a worker process for get_stability().
+
+    Args:
+        X (numpy.ndarray): standardized data.
+        labels (numpy.ndarray): reference cluster assignment for each row in X.
+        k (int): number of clusters.
+        seed (list): seed for resampling and KMeans centroid initialization.
+        kmeans_n_init (int): how many times KMeans runs with different initial centroid seeds.
+        mini_batch (bool): whether to fit with fit_mini_batch() instead of full-batch KMeans.
+        batch_size (int): number of rows per mini-batch.
+
+    Returns:
+        tuple:
+            numpy.ndarray: Jaccard similarity of each reference cluster with its most similar
+                bootstrap cluster, among resampled rows.
+            numpy.ndarray: whether each row's bootstrap cluster, matched to reference clusters,
+                agrees with its reference cluster.
+    """
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, len(X), len(X))
+    random_state = int(rng.integers(2**31 - 1))
+
+    if mini_batch:
+        model, _ = fit_mini_batch(X[idx], k, batch_size, random_state=random_state)
+    else:
+        model = KMeans(n_clusters=k, n_init=kmeans_n_init, random_state=random_state)
+        model.fit(X[idx])
+    boot_labels = model.predict(X)
+
+    #count overlap of reference and bootstrap clusters among resampled rows, counted once each
+    in_bag = np.zeros(len(X), dtype=bool)
+    in_bag[idx] = True
+    overlap = np.bincount(labels[in_bag] * k + boot_labels[in_bag], minlength=k * k)
+    overlap = overlap.reshape(k, k)
+    union = overlap.sum(axis=1)[:, None] + overlap.sum(axis=0)[None, :] - overlap
+    jaccard = (overlap / np.maximum(union, 1)).max(axis=1)
+
+    #match bootstrap clusters to reference clusters by most overlap, to compare every row
+    ref, boot = linear_sum_assignment(-overlap)
+    mapping = np.empty(k, dtype=labels.dtype)
+    mapping[boot] = ref
+    return jaccard, mapping[boot_labels] == labels
+
+def get_stability(
+        X,
+        labels,
+        k,
+        n_bootstraps=100,
+        n_jobs=-1,
+        kmeans_n_init=30,
+        kmeans_random_state=42,
+        mini_batch=False,
+        batch_size=4096
+    ):
+    """
+    Refits k-means with the same configuration as run_kmeans() on bootstrap resamples, in
+    parallel across cores, to measure how stable the reference clusters are:
+        -per cluster, the average Jaccard similarity with its most similar bootstrap cluster,
+         where under 0.6 suggests a cluster isn't reliably found, and over 0.75 that it is stable
+        -per donor, the share of bootstraps that assign the donor to its reference cluster
+
+    Args:
+        X (numpy.ndarray): standardized float32 data from prep_data().
+        labels (array-like): reference cluster assignment per donor, from run_kmeans().
+        k (int): number of clusters.
+        n_bootstraps (int): number of bootstrap resamples.
+        n_jobs (int): number of worker processes, with -1 using all cores.
+        kmeans_n_init (int): how many times KMeans runs with different initial centroid seeds.
+        kmeans_random_state (int): seed for resamples, so results are reproducible.
+        mini_batch (bool): whether to fit with fit_mini_batch() instead of full-batch KMeans.
+        batch_size (int): number of rows per mini-batch.
+
+    Returns:
+        tuple:
+            pandas.DataFrame: Jaccard stability and mean donor confidence per cluster.
+            pandas.Series: assignment confidence per donor.
+
+    Reference: Hennig, Cluster-wise assessment of cluster stability, 2007.
+    """
+    labels = np.asarray(labels)
+
+    #one thread per worker process, so KMeans threads don't multiply across workers
+    with parallel_config(backend='loky', inner_max_num_threads=1):
+        results = Parallel(n_jobs=n_jobs)(
+            delayed(fit_bootstrap)(X, labels, k, [kmeans_random_state, b],
+                                   kmeans_n_init, mini_batch, batch_size)
+            for b in range(n_bootstraps)
+        )
+    jaccard = np.mean([result[0] for result in results], axis=0)
+    ser_confidence = pd.Series(np.mean([result[1] for result in results], axis=0))
+
+    df_stability = pd.DataFrame({
+        'Jaccard': jaccard,
+        'Confidence': ser_confidence.groupby(labels).mean(),
+        'Frequencies': np.bincount(labels, minlength=k)
+    })
+    df_stability.index.name = 'Cluster'
+    return df_stability, ser_confidence
+
+def get_stability_parser():
+    """
+    Gets command-line parser for cluster modules, with a --bootstraps option for stability.
+
+    Examples:
+        $ python -m src.cluster.stability 4 --bootstraps 200
+
+    Returns:
+        argparse.ArgumentParser.
+    """
+    parser = get_parser()
+    parser.add_argument(
+        '--bootstraps',
+        type=int,
+        default=100,
+        help='Number of bootstrap resamples for cluster stability, defaults to 100'
+    )
+    return parser
+
+def main():
+    parser = get_stability_parser()
+    args = parse_args(parser)
+    options = parse_options(parser)
+    n_bootstraps = parser.parse_args().bootstraps
+    k = args[0] if len(args) > 0 else 4
+
+    #use a fixed seed by default, so stability results are reproducible
+    if options['kmeans_random_state'] is None:
+        options['kmeans_random_state'] = 42
+
+    df = get_data()
+    scaler = fit_scaler(df)
+    X = prep_data(df, scaler=scaler)
+    output_dir = get_output_dir('cluster')
+
+    ser_cluster_labels = run_kmeans(X,
+                                    output_dir,
+                                    clusters_pca_scatterplots=range(k,k+1),
+                                    scaler=scaler,
+                                    data_hash=hash_frame(df),
+                                    **options)
+
+    df_stability, ser_confidence = get_stability(X,
+                                                 ser_cluster_labels,
+                                                 k,
+                                                 n_bootstraps=n_bootstraps,
+                                                 kmeans_random_state=options['kmeans_random_state'],
+                                                 mini_batch=options['mini_batch'],
+                                                 batch_size=options['batch_size'])
+
+    print('\n\nCluster stability over', n_bootstraps, 'bootstraps\n')
+    print(df_stability)
+    df_stability.to_csv(os.path.join(output_dir, 'stability.csv'))
+
+    df_groups = merge_cluster_labels(df, ser_cluster_labels, output_dir, ser_confidence)
+    plot_cluster_sizes(df_groups, output_dir)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,13 @@
 # name of raw xlsx file for cluster profiles or segment analyses
 DATA_DONORS = 'donors-5-years-2024-09-30.xlsx'
 
+# whether to also save the cleaned working data as a human-readable xlsx file
+EXPORT_WORKING_EXCEL = False
+
+# number of rows to read at a time when cleaning the raw Allegiance download, which keeps
+# memory flat for large downloads - set to None to read the whole file at once
+INGEST_CHUNK_SIZE = 100000
+
 # name of xlsx file with demographics, to merge with analysis files 
 DATA_DEMOGRAPHICS = '2022-10-02-demographics.xlsx'
 
@@ -14,9 +21,46 @@ DATA_END = '2024-09-30'
 #   -https://stackoverflow.com/questions/22205159/format-pandas-datatime-object-to-show-fiscal-years-from-feb-to-feb-and-be-format
 YEAR_CUTOFF = 'Y-SEP' 
 
+# custom segments for src.segment.specs, as name: conditions on columns in processed donors
+# data, combined with and, or, not, comparisons and arithmetic - a column name on its own means
+# it isn't 0, such as for flags - or as name: {'where': conditions, 'aggregate': {column: func}} 
+# to override SEGMENT_AGGREGATES, with func one of sum, mean, min or max
+SEGMENTS = {
+    'online_sustainers': 'Sustainer and Online and Annual_Payment > 120',
+    'major_donors': 'Major',
+    'passport_not_renewing': 'Passport and not Renew',
+    'new_online': 'New and Online',
+    'multi_year': 'Num_Years >= 3'
+}
+
+# default aggregations for each custom segment
+SEGMENT_AGGREGATES = {
+    'Total_Payments': 'sum',
+    'Annual_Payment': 'mean',
+    'Annual_Count': 'mean',
+    'Status': 'mean',
+    'Passport': 'mean',
+    'Gift': 'mean'
+}
+
 # path to Passport database application
 PASSPORT_APP = 'T:\\Public Relations\\ONLINE\\Passport\\STATS'
 
+# path to a local SQLite database to query Passport views from instead of PASSPORT_APP, with a
+# views table of alleg_account_id, date, content_channel, genre and total_count per account per
+# show per day - set to None to query the Passport database app
+PASSPORT_LOCAL_DB = None
+
+# max number of member ids sent in each Passport views query, and max number of queries run at
+# the same time, so query size stays bounded however many members there are
+PASSPORT_ID_BATCH_SIZE = 1000
+PASSPORT_QUERY_WORKERS = 4
+
 # the date range to filter Passport views - both are inclusive
 PASSPORT_VIEWS_START_DATE = '2019-10-01' 
 PASSPORT_VIEWS_END_DATE = '2024-09-30'
+
+# days after a month ends before its Passport views are saved to the local cache, since views
+# can take a while to load into the Passport database - months ending more recently are always
+# queried again
+PASSPORT_CACHE_SETTLE_DAYS = 7
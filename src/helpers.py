@@ -1,12 +1,13 @@
 import os
 from src import ROOT_DIR, DATA_DONORS_PROCESSED
-from src.process.donors import process_data
+from src.process.cache import is_current
+from src.process.donors import process_data, get_fingerprint
 import pandas as pd
 
 def get_data(data_file_processed=DATA_DONORS_PROCESSED):
     """
     Gets data from data/processed/donors.csv, running process_data() first if it 
-    doesn't exist, and returning a pandas.DataFrame.
+    doesn't exist or is stale, and returning a pandas.DataFrame.
 
     Arg:
         data_file_processed (str): path to where csv data file is or will be.               
@@ -15,8 +16,8 @@ def get_data(data_file_processed=DATA_DONORS_PROCESSED):
         pandas.DataFrame.
     """
 
-    #create processed data if it doesn't exist
-    if not os.path.isfile(data_file_processed):
+    #create processed data if it doesn't exist, or raw data or parameters have changed
+    if not is_current(data_file_processed, get_fingerprint()):
         process_data()
 
     df = pd.read_csv(data_file_processed) 
@@ -0,0 +1,146 @@
+import os
+import json
+import hashlib
+from functools import lru_cache
+import pandas as pd
+from src import DATA_MANIFEST
+
+@lru_cache(maxsize=None)
+def _hash_file(path, size, mtime):
+    """
+    Hashes file contents, memoized on path, size and modified time so each input file is
+    only read once per run.
+    """
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def hash_file(path):
+    """
+    Gets a sha256 hash of a file's contents.
+
+    Args:
+        path (str): path to file to hash.
+
+    Returns:
+        str: hex digest, or None if the file does not exist.
+    """
+    if not os.path.isfile(path):
+        return None
+
+    stat = os.stat(path)
+    return _hash_file(path, stat.st_size, stat.st_mtime_ns)
+
+def hash_frame(df):
+    """
+    Gets a sha256 hash of a dataframe's index and values.
+
+    Args:
+        df (pandas.DataFrame): dataframe to hash.
+
+    Returns:
+        str: hex digest.
+    """
+    values = pd.util.hash_pandas_object(df, index=True).values
+    return hashlib.sha256(values.tobytes()).hexdigest()
+
+def fingerprint(files, **params):
+    """
+    Creates a fingerprint of the inputs used to build a cached file: a hash of each input file
+    plus the parameters used, such as date ranges.
+
+    Args:
+        files (List[str]): paths to input files the cached file is built from.
+        **params: parameters the cached file is built with, which need to be JSON serializable.
+
+    Returns:
+        dict: with 'files' and 'params' keys.
+    """
+    return {
+        'files': {os.path.basename(file): hash_file(file) for file in files},
+        'params': params
+    }
+
+def read_manifest(manifest=DATA_MANIFEST):
+    """
+    Reads manifest of fingerprints for cached files.
+
+    Args:
+        manifest (str): path to manifest json file.
+
+    Returns:
+        dict: fingerprints keyed on cached file names, or empty dict if there is no manifest.
+    """
+    if not os.path.isfile(manifest):
+        return {}
+
+    try:
+        with open(manifest) as f:
+            return json.load(f)
+    except ValueError:
+        print(f'\nCould not read manifest {manifest}, cached files will be rebuilt')
+        return {}
+
+def get_deltas(file, manifest=DATA_MANIFEST):
+    """
+    Gets paths of delta files that have been merged into a cached file, as recorded in the
+    'deltas' parameter of its fingerprint.
+
+    Args:
+        file (str): path to cached file.
+        manifest (str): path to manifest json file.
+
+    Returns:
+        List[str]: paths to delta files, in the order they were merged.
+    """
+    entry = read_manifest(manifest).get(os.path.basename(file), {})
+    return entry.get('params', {}).get('deltas', [])
+
+def is_current(file, fingerprint, manifest=DATA_MANIFEST):
+    """
+    Checks whether a cached file exists and was built from the same input files and parameters.
+    If an input file is not available to hash, an existing cached file is trusted.
+
+    Args:
+        file (str): path to cached file.
+        fingerprint (dict): fingerprint from fingerprint() for current inputs.
+        manifest (str): path to manifest json file.
+
+    Returns:
+        bool: True if cached file can be reused.
+    """
+    if not os.path.isfile(file):
+        return False
+
+    if None in fingerprint['files'].values():
+        print(f'\nINPUT FILES MISSING, USING CACHED {os.path.basename(file)}')
+        return True
+
+    current = read_manifest(manifest).get(os.path.basename(file)) == fingerprint
+    if not current:
+        print(f'\nINPUTS CHANGED, REBUILDING {os.path.basename(file)}')
+
+    return current
+
+def record(file, fingerprint, manifest=DATA_MANIFEST):
+    """
+    Saves fingerprint for a newly built cached file to the manifest.
+
+    Args:
+        file (str): path to cached file.
+        fingerprint (dict): fingerprint from fingerprint() for inputs the file was built from.
+        manifest (str): path to manifest json file.
+
+    Returns:
+        None.
+    """
+    entries = read_manifest(manifest)
+    entries[os.path.basename(file)] = fingerprint
+
+    #write to temp file first so an interrupted run can't leave a corrupt manifest
+    temp = manifest + '.tmp'
+    with open(temp, 'w') as f:
+        json.dump(entries, f, indent=2)
+    os.replace(temp, manifest)
@@ -0,0 +1,78 @@
+import pandas as pd
+from .cache import fingerprint, get_deltas, is_current, record
+from .helpers import clean, add_flags
+from src import (
+    DATA_DONORS_RAW,
+    DATA_DONORS_WORKING,
+    DATA_DONORS_WORKING_EXPORT,
+    DATA_DONORS_DAILY
+)
+
+def get_fingerprint(data_file_raw=DATA_DONORS_RAW, data_file_working=DATA_DONORS_WORKING):
+    """
+    Gets fingerprint of the raw data file, and any delta files merged into the working file,
+    that daily rollup data is built from, to check whether the saved file is current.
+
+    Args:
+        data_file_raw (str): path to raw Excel file to start with.
+        data_file_working (str): path to working Parquet file that delta files are merged into.
+
+    Returns:
+        dict: fingerprint from src.process.cache.fingerprint().
+    """
+    return fingerprint([data_file_raw] + get_deltas(data_file_working))
+
+def get_daily(
+    data_file_raw=DATA_DONORS_RAW,
+    data_file_working=DATA_DONORS_WORKING,
+    data_file_export=DATA_DONORS_WORKING_EXPORT,
+    data_file_daily=DATA_DONORS_DAILY
+):
+    """
+    Gets daily rollup data, where each row totals pledges for a day, Type, Page, Passport flag
+    and Gift value, so timelines at any frequency and with any categories can be resampled from
+    it instead of from every pledge. If data_file_daily is not current, it is rebuilt:
+        -gets working data with clean()
+        -sets Passport flag to 1 if Passport was activated within the 1-year pledge window
+        -adds Payments column, as paid plus balance
+        -groups on Date, Type, Page, Passport and Gift, keeping missing values as their own groups,
+         and totals Payments, number of Pledges, and number of distinct Donors
+        -saves to data_file_daily
+
+    Donors are distinct within each row, so summing Donors over several days or groups counts a
+    donor once for each day and group they pledged in.
+
+    Args:
+        data_file_raw (str): path to raw Excel file to start with.
+        data_file_working (str): path to working Parquet file if raw file has been initially cleaned.
+        data_file_export (str): optional path to save an Excel copy of the working file to.
+        data_file_daily (str): path to where to save daily rollup data as a Parquet file.
+
+    Returns:
+        pandas.DataFrame.
+    """
+
+    inputs = get_fingerprint(data_file_raw, data_file_working)
+    if is_current(data_file_daily, inputs):
+        print('\nUSING DAILY DF')
+        return pd.read_parquet(data_file_daily)
+
+    cols_new = ['ID', 'Status', 'Sustainer', 'Major', 'Passport', 'Date', 'Type', 'Gift', 'Page']
+    cols_keep = ['Count', 'Paid to Date', 'Balance']
+    df = clean(data_file_raw, data_file_working, cols_new, cols_keep, data_file_export)
+
+    df = add_flags(df, ['Passport'])
+    df['Date'] = df['Date'].dt.normalize()
+    df['Payments'] = df['Paid to Date'] + df['Balance'] #add paid and balance
+
+    df = df.groupby(['Date', 'Type', 'Page', 'Passport', 'Gift'], observed=True, dropna=False).agg(
+        Payments=('Payments', 'sum'),
+        Pledges=('ID', 'size'),
+        Donors=('ID', 'nunique')
+    )
+    df = df.reset_index()
+    print('\nDAILY:', df.shape)
+
+    df.to_parquet(data_file_daily, index=False)
+    record(data_file_daily, inputs)
+    return df
@@ -0,0 +1,119 @@
+import os
+import sys
+import argparse
+from .cache import is_current
+from .helpers import merge_delta
+from . import donors, new_donors, pledges
+from src import (
+    DATA_RAW_DIR,
+    DATA_DONORS_RAW,
+    DATA_DONORS_WORKING,
+    DATA_DONORS_WORKING_EXPORT,
+    DATA_DONORS_PLEDGES,
+    DATA_DONORS_PROCESSED,
+    DATA_DONORS_NEW_PROCESSED
+)
+
+def parse_args():
+    """
+    Parses command-line argument for name of delta xlsx file from an Allegiance download,
+    which is placed in data/raw/ and covers only recent pledges.
+
+    Examples:
+        $ python -m src.process.delta donors-2024-10-31.xlsx
+
+    Returns:
+        str: filename specified by the user.
+    """
+    parser = argparse.ArgumentParser(description='Run process delta module')
+    parser.add_argument(
+        'filename',
+        type=str,
+        help='Specify name of delta xlsx file in data/raw/ to merge into working data'
+    )
+    arg, unknown = parser.parse_known_args()
+    return arg.filename
+
+def update(
+    data_file_delta,
+    data_file_raw=DATA_DONORS_RAW,
+    data_file_working=DATA_DONORS_WORKING,
+    data_file_export=DATA_DONORS_WORKING_EXPORT,
+    data_file_pledges=DATA_DONORS_PLEDGES,
+    data_file_processed=DATA_DONORS_PROCESSED,
+    data_file_new_processed=DATA_DONORS_NEW_PROCESSED
+):
+    """
+    Merges a delta download into the working data with helpers.merge_delta(), and then updates
+    pledge data, processed donors and new donors data:
+        -if pledge data was current before the merge, only pledges of donors in the delta 
+         download are transformed again, and the rest are kept
+        -if a processed file was current before the merge, only donors with pledges in the
+         delta download are reprocessed, and their rows replaced
+        -otherwise files are fully rebuilt
+
+    Args:
+        data_file_delta (str): path to Excel file with delta download.
+        data_file_raw (str): path to raw Excel file the working file was built from.
+        data_file_working (str): path to working Parquet file.
+        data_file_export (str): optional path to save an Excel copy of the working file to.
+        data_file_pledges (str): path to pledge data Parquet file.
+        data_file_processed (str): path to processed donors csv file.
+        data_file_new_processed (str): path to processed new donors csv file.
+
+    Returns:
+        int: 0 to indicate success.
+    """
+
+    print('\n\nRUNNING src/process/delta.py update\n')
+
+    #check which files can be updated in place, before merging changes the inputs
+    pledges_current = is_current(data_file_pledges,
+                                 pledges.get_fingerprint(data_file_raw, data_file_working))
+    donors_current = is_current(data_file_processed,
+                                donors.get_fingerprint(data_file_raw, data_file_working))
+    new_donors_current = is_current(data_file_new_processed,
+                                    new_donors.get_fingerprint(data_file_raw, data_file_working))
+
+    cols_new = ['ID', 'Status', 'Sustainer', 'Major', 'Passport', 'Date', 'Type', 'Gift', 'Page']
+    cols_keep = ['Count', 'Paid to Date', 'Balance']
+    ids = merge_delta(data_file_raw,
+                      data_file_delta,
+                      data_file_working,
+                      cols_new,
+                      cols_keep,
+                      data_file_export)
+
+    pledges.get_pledges(data_file_raw=data_file_raw,
+                        data_file_working=data_file_working,
+                        data_file_export=data_file_export,
+                        data_file_pledges=data_file_pledges,
+                        ids=ids if pledges_current else None)
+
+    donors.process_data(data_file_raw=data_file_raw,
+                        data_file_working=data_file_working,
+                        data_file_export=data_file_export,
+                        data_file_pledges=data_file_pledges,
+                        data_file_processed=data_file_processed,
+                        ids=ids if donors_current else None)
+
+    new_donors.process_data(data_file_raw=data_file_raw,
+                            data_file_working=data_file_working,
+                            data_file_export=data_file_export,
+                            data_file_pledges=data_file_pledges,
+                            data_file_processed=data_file_new_processed,
+                            ids=ids if new_donors_current else None)
+    return 0
+
+def main():
+    arg = parse_args()
+    path = os.path.join(DATA_RAW_DIR, arg)
+
+    if os.path.isfile(path):
+        return update(path)
+
+    else:
+        print('\nFile does not exist:\n', '  ', path)
+
+if __name__ == '__main__':
+    sys.exit(main())
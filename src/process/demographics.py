@@ -3,21 +3,61 @@ from datetime import datetime
 from dateutil.relativedelta import relativedelta
 import pandas as pd
 import numpy as np
-from .helpers import clean
-from src import DATA_DEMOGRAPHICS_RAW, DATA_DEMOGRAPHICS_PROCESSED
+from .cache import fingerprint, record
+from src import DATA_DEMOGRAPHICS_RAW, DATA_DEMOGRAPHICS_PROCESSED, DATA_DEMOGRAPHICS_STORE
+
+def get_fingerprint(data_file_raw=DATA_DEMOGRAPHICS_RAW):
+    """
+    Gets fingerprint of the raw WealthEngine file that clean() builds its csv file from, 
+    to check whether a saved csv file is current.
+
+    Args:
+        data_file_raw (str): path to raw Excel file to start with.
+
+    Returns:
+        dict: fingerprint from src.process.cache.fingerprint().
+    """
+    return fingerprint([data_file_raw])
+
+def map_values(ser, values):
+    """
+    Maps each value in ser to a number in values, in one array operation through categorical 
+    codes instead of looking up each element. Missing values stay missing.
+
+    Args:
+        ser (pandas.Series): values to map.
+        values (dict): number for each value, with np.nan for values that can't be rated. 
+
+    Returns:
+        numpy.ndarray: of floats.
+
+    Raises:
+        ValueError: if ser has a value that isn't in values.
+    """
+    codes = pd.Categorical(ser, categories=list(values)).codes
+    unknown = ser.notna().to_numpy() & (codes < 0)
+    if unknown.any():
+        raise ValueError(f'Unknown {ser.name} values: {list(ser[unknown].unique())}')
+
+    #missing values have code -1, which points to the appended nan
+    numbers = np.append(np.array(list(values.values()), dtype='float64'), np.nan)
+    return numbers[codes]
 
 def clean(
         data_file_raw=DATA_DEMOGRAPHICS_RAW, 
-        data_file_processed=DATA_DEMOGRAPHICS_PROCESSED
+        data_file_processed=DATA_DEMOGRAPHICS_PROCESSED,
+        data_file_store=DATA_DEMOGRAPHICS_STORE
 ):
     """
     Transforms Gender, Age and Income range columns to Age, Female and minimum Income 
     columns from WealthEngine output file. Renames AcctID column to ID and sets ID as 
-    index. Drops all other columns. 
+    index. Drops all other columns. Also saves a copy sorted on ID as a Parquet file, for 
+    src.augment.demographics to look up IDs in without hashing the whole table.
 
     Args:
         data_file_raw (str): path to raw Excel file to start with.
         data_file_processed (str): path to where to save final csv file output.               
+        data_file_store (str): path to where to save Parquet file sorted on ID.
     
     Returns:
         int: 0 to indicate success.    
@@ -29,8 +69,8 @@ def clean(
     df = df.set_index('ID')
     
     #transform Gender and Income columns  
-    gender = {'M': 0, 'F': 1, np.nan: np.nan}
-    df['Gender'] = df['Gender'].map(lambda x: gender[x])
+    gender = {'M': 0, 'F': 1}
+    df['Gender'] = map_values(df['Gender'], gender)
     df = df.rename(columns={'Gender': 'Female'})
     
     income_levels = {'$1-$50K': 1,
@@ -39,7 +79,7 @@ def clean(
                      '$250K-$500K': 250000,
                      '$500K+': 500000, 
                      'Unable to rate': np.nan}
-    df['Income'] = df['Income'].map(lambda x: income_levels[x.strip()])
+    df['Income'] = map_values(df['Income'].str.strip(), income_levels)
     
     print('\n', df.shape)
     print('\n', df.head())
@@ -52,10 +92,13 @@ def clean(
     print('Min Income:', df['Income'].mean())
     
     
-    #save prepped copy  
+    #save prepped copy, and copy sorted on ID
+    inputs = get_fingerprint(data_file_raw)
     df.to_csv(data_file_processed)
+    record(data_file_processed, inputs)
+    df.sort_index(kind='stable').to_parquet(data_file_store)
+    record(data_file_store, inputs)
     return 0  
     
 if __name__ == '__main__': 
     sys.exit(clean())
-    
\ No newline at end of file
@@ -1,9 +1,13 @@
+import os
 import sys
 import pandas as pd
-from .helpers import clean, pass_pages, web_pages
+from .cache import record
+from .pledges import get_pledges, get_fingerprint
 from src import (
     DATA_DONORS_RAW, 
     DATA_DONORS_WORKING,
+    DATA_DONORS_WORKING_EXPORT,
+    DATA_DONORS_PLEDGES,
     DATA_DONORS_PROCESSED,
     DATA_START, 
     DATA_END, 
@@ -13,26 +17,33 @@ from src import (
 def process_data(
     data_file_raw=DATA_DONORS_RAW,
     data_file_working=DATA_DONORS_WORKING,
+    data_file_export=DATA_DONORS_WORKING_EXPORT,
+    data_file_pledges=DATA_DONORS_PLEDGES,
     data_file_processed=DATA_DONORS_PROCESSED,
     date_start=DATA_START,
     date_end=DATA_END,
-    year_cutoff=YEAR_CUTOFF
+    year_cutoff=YEAR_CUTOFF,
+    ids=None
 ):
 
     """
     Processes data for use in donor_profiles and/or segment analyses such as passport_donors:
-        -filters by start and end dates
-        -transform variables to continuous values, creating new columns where needed
+        -gets pledge data from src.process.pledges.get_pledges(), which filters by start and end 
+         dates, and transforms variables to continuous values, creating new columns where needed
         -aggregates rows (where each is a donor pledge) to lifetime values (where each row is a donor)
         -saves a prepped csv file by appending '-prepped' to file name
 
     Args:
         data_file_raw (str): path to raw Excel file to start with.
-        data_file_working (str): path to working Excel file if raw file has been initially cleaned.
+        data_file_working (str): path to working Parquet file if raw file has been initially cleaned.
+        data_file_export (str): optional path to save an Excel copy of the working file to.
+        data_file_pledges (str): path to pledge data Parquet file shared with other processing.
         data_file_processed (str): path to where to save final csv file output.
         date_start (str): for date range filter, is inclusive, in format 2019-10-01.
         date_end (str): for date range filter, is inclusive, in format 2022-09-30.
         year_cutoff (str): where to cutoff year timeframe, is inclusive, defaults to fy.                    
+        ids (List[int]): if set, and data_file_processed exists, only these donors are reprocessed 
+            and their rows replaced in data_file_processed, such as after merging a delta download.
     
     Returns:
         int: 0 to indicate success.
@@ -44,47 +55,26 @@ def process_data(
     """
 
     # ===================================
-    # get and clean member data
+    # get pledge data, filtered by date range and transformed to continuous values
     # ===================================
    
-    cols_new = ['ID', 'Status', 'Sustainer', 'Major', 'Passport', 'Date', 'Type', 'Gift', 'Page']
-    cols_keep = ['Count', 'Paid to Date', 'Balance']
-    df = clean(data_file_raw, data_file_working, cols_new, cols_keep)    
+    df = get_pledges(data_file_raw, 
+                     data_file_working, 
+                     data_file_export, 
+                     data_file_pledges, 
+                     date_start, 
+                     date_end, 
+                     year_cutoff)    
     #print('\n', df.tail())
 
-    # ===================================
-    # filter by date range
-    # ===================================
-    
-    df = df[(df['Date'] >= date_start) & (df['Date'] <= date_end)]
-    #print('\n', df.tail())
+    #only reprocess select donors if processed data already exists 
+    incremental = ids is not None and os.path.isfile(data_file_processed)
+    if incremental:
+        df = df[df['ID'].isin(ids)]
+        print('\nREPROCESSING DONORS:', len(ids))
 
-    # ==================================================
-    # transform variables to continuous values
-    # ==================================================  
-    
-    #convert fields
-    df['Status'] = df['Status'].map(lambda x: 1 if x.strip() == 'MEMB' else 0) 
-    df['Sustainer'] = df['Sustainer'].map(lambda x: 1 if x.strip() == 'ACT' else 0)
-    df['Major'] = df['Major'].map(lambda x: 1 if pd.notnull(x) else 0)
-    df['Passport'] = df['Passport'] - pd.offsets.DateOffset(years=1) #match 1-yr pledge window
-    df['Passport'] = df.apply(lambda x: 1 if x['Passport'] < x['Date'] else 0, axis=1)
-    df['Date'] = pd.to_datetime(df['Date']).dt.to_period(year_cutoff) #set to a year
-    df['Gift'] = df['Gift'].map(lambda x: 1 if x.strip() == 'YES' else 0)
-    
-    #add new fields
-    df['Rejoin'] = df['Type'].map(lambda x: 1 if x.strip() == 'EXPR' else 0) 
-    df['Renew'] = df['Type'].map(lambda x: 1 if x.strip() == 'RENL' else 0) 
-    df['Add'] = df['Type'].map(lambda x: 1 if x.strip() == 'ADDG' else 0) 
-    df['New'] = df['Type'].map(lambda x: 1 if x.strip() == 'NEW' else 0)  
-    df['Payments'] = df['Paid to Date'] + df['Balance'] #add paid and balance   
-    
-    online_pages = pass_pages + web_pages
-    df['Online'] = df['Page'].str.strip().isin(online_pages)
-    df['Online'] = df['Online'].map(lambda x: 1 if x == True else 0)
-    
-    #delete old fields
-    df = df.drop(['Type', 'Page', 'Paid to Date', 'Balance'], axis=1) 
+    #delete fields not aggregated
+    df = df.drop(['Date', 'Type', 'Page'], axis=1) 
     
     print('\n', df.tail())
 
@@ -113,23 +103,29 @@ def process_data(
         'Add': 'mean',     
         'New': 'mean',
         'Online': 'mean',
-        'Date': 'nunique'
+        'Year': 'nunique'
     }
     
     df = df.groupby('ID').agg(aggreg)
     df = df.rename(columns={'Count':'Total_Count', 
                             'Payments':'Total_Payments', 
-                            'Date':'Num_Years'})
+                            'Year':'Num_Years'})
     df['Annual_Payment'] = df['Total_Payments'] / df['Num_Years']
     df['Annual_Count'] = df['Total_Count'] / df['Num_Years']
     
     print('\n', df.tail())
     
     # ===================================
-    # save processed copy 
+    # save processed copy, replacing rows of reprocessed donors if incremental
     # ===================================    
+
+    if incremental:
+        df_saved = pd.read_csv(data_file_processed, index_col='ID')
+        df = pd.concat([df_saved[~df_saved.index.isin(ids)], df]).sort_index()
    
     df.to_csv(data_file_processed)
+    record(data_file_processed, 
+           get_fingerprint(data_file_raw, data_file_working, date_start, date_end, year_cutoff))
     return 0
 
 if __name__ == '__main__': 
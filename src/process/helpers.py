@@ -1,6 +1,11 @@
 import os
+import openpyxl
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src import INGEST_CHUNK_SIZE
+from .cache import fingerprint, get_deltas, is_current, record
 
 # ===================================
 # landing page variables
@@ -55,52 +60,257 @@ other_pages = [
     'OTHER'
 ]
 
+# ===================================
+# code dictionary for pledge code columns, stored as categoricals so known codes always 
+# have the same small integer values, with any other codes found in data appended after 
+# ===================================
 
-def split_each_column(file, cols_new=['Date', 'Page'], cols_keep=['Description', 'Count', 'Amount']):
+code_categories = {
+    'Status': ['MEMB'],
+    'Sustainer': ['ACT'],
+    'Type': ['NEW', 'RENL', 'ADDG', 'EXPR'],
+    'Gift': ['YES', 'NO'],
+    'Page': web_pages + view_pages + other_pages
+}
+
+# ===================================
+# pledge flag columns, set to 1 where source column is in values
+# ===================================
+
+flag_columns = {
+    'Status': ('Status', ['MEMB']),
+    'Sustainer': ('Sustainer', ['ACT']),
+    'Gift': ('Gift', ['YES']),
+    'Rejoin': ('Type', ['EXPR']),
+    'Renew': ('Type', ['RENL']),
+    'Add': ('Type', ['ADDG']),
+    'New': ('Type', ['NEW']),
+    'Online': ('Page', pass_pages + web_pages)
+}
+
+# ===================================
+# working file column types
+# ===================================
+
+working_dtypes = {
+    'ID': 'int64',
+    'Status': 'category',
+    'Sustainer': 'category',
+    'Major': 'string',
+    'Passport': 'datetime64[ns]',
+    'Date': 'datetime64[ns]',
+    'Type': 'category',
+    'Gift': 'category',
+    'Page': 'category',
+    'Description': 'string',
+    'Count': 'int64',
+    'Amount': 'float64',
+    'Paid to Date': 'float64',
+    'Balance': 'float64'
+}
+
+
+def split_frame(df, cols_new=['Date', 'Page'], cols_keep=['Description', 'Count', 'Amount']):
     """
-    Takes an Excel download from Allegiance, and splits the 'Each -' column into separate columns 
+    Splits the 'Each -' column of a dataframe read from an Allegiance download into separate 
+    columns, removes the 'Total' row and trims strings. Used for both whole files and chunks.
 
     Args:
-        file (str): path to Excel spreadsheet to read data from. 
+        df (pandas.DataFrame): rows read from an Allegiance Excel download. 
         cols_new (List[str]): columns that spreadsheet's 'Each--' column will be split into.
         cols_keep (List[str]): spreadsheet columns that will be kept.  
 
     Returns:
         pandas.DataFrame: with new and kept columns.       
     """
-    
-    print('\nSPLITTING "Each" COLUMN ...')
-        
-    df = pd.read_excel(file)    
+
     df = df.rename(columns = lambda x: x.strip()) 
+    df = df[~df['Each -'].str.match(r'Total( - |$)', na=False)] #remove 'Total' row
+    if df.empty: 
+        return pd.DataFrame(columns=cols_new + cols_keep)
     
     df_split = df['Each -'].str.split(' - ', expand=True)
     df_split.columns = cols_new    
     df_trim = df[cols_keep]
     df_donors = pd.concat([df_split, df_trim], axis=1)
-    df_donors = df_donors[df_donors.iloc[:,0] != 'Total'] #remove 'Total' row
     
     #trim strings, and replace empty strings with nan
     df_donors = df_donors.apply(lambda x: x.str.strip().replace('', np.nan) if x.dtype=='object' else x)
     
     if 'Page' in df.columns: df_donors.Page = df_donors.Page.replace('', 'OTHER')     
     return df_donors   
+
+def split_each_column(file, cols_new=['Date', 'Page'], cols_keep=['Description', 'Count', 'Amount']):
+    """
+    Takes an Excel download from Allegiance, and splits the 'Each -' column into separate columns 
+
+    Args:
+        file (str): path to Excel spreadsheet to read data from. 
+        cols_new (List[str]): columns that spreadsheet's 'Each--' column will be split into.
+        cols_keep (List[str]): spreadsheet columns that will be kept.  
+
+    Returns:
+        pandas.DataFrame: with new and kept columns.       
+    """
+    
+    print('\nSPLITTING "Each" COLUMN ...')
+        
+    df = pd.read_excel(file)    
+    return split_frame(df, cols_new, cols_keep)
+
+def read_excel_chunks(file, chunk_size):
+    """
+    Reads the first sheet of an Excel file row by row with openpyxl in read-only mode, and yields 
+    the rows as dataframes of up to chunk_size rows, so the whole file is never held in memory. 
+
+    Args:
+        file (str): path to Excel spreadsheet to read data from. 
+        chunk_size (int): number of rows per yielded dataframe. 
+
+    Returns:
+        Iterator[pandas.DataFrame]: chunks of rows, with the first row of the sheet as columns.
+    """
+
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = ['' if x is None else str(x) for x in next(rows)]
+
+        chunk = []
+        for row in rows:
+            if all(x is None for x in row): continue #skip empty rows
+            chunk.append(row[:len(header)])
+            if len(chunk) == chunk_size:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+
+        if chunk: 
+            yield pd.DataFrame(chunk, columns=header)
+
+    finally:
+        wb.close()
+
+def stream_each_column(file_raw, file_working, cols_new, cols_keep, chunk_size):
+    """
+    Streaming version of split_each_column(). Reads file_raw in chunks of chunk_size rows, splits, 
+    trims and types each chunk, and appends it to the Parquet file_working, so peak memory 
+    stays flat regardless of how many rows the download has.
+
+    Args:
+        file_raw (str): path to Excel spreadsheet to read raw data from. 
+        file_working (str): path to Parquet file to append cleaned chunks to. 
+        cols_new (List[str]): columns that spreadsheet's 'Each--' column will be split into.
+        cols_keep (List[str]): spreadsheet columns that will be kept.  
+        chunk_size (int): number of rows to read and clean at a time.
+
+    Returns:
+        int: number of rows written to file_working.
+    """
+
+    print(f'\nSTREAMING "Each" COLUMN IN CHUNKS OF {chunk_size} ROWS ...')
+
+    writer = None
+    rows = 0
+    try:
+        for chunk in read_excel_chunks(file_raw, chunk_size):
+            df = set_dtypes(split_frame(chunk, cols_new, cols_keep))
+            if df.empty: continue
+
+            #widen code column indices, since chunks can have different numbers of codes
+            if writer is None:
+                schema = pa.Table.from_pandas(df, preserve_index=False).schema
+                schema = pa.schema([
+                    field.with_type(pa.dictionary(pa.int32(), field.type.value_type)) 
+                    if pa.types.is_dictionary(field.type) else field 
+                    for field in schema
+                ], metadata=schema.metadata)
+                writer = pq.ParquetWriter(file_working, schema)
+
+            table = pa.Table.from_pandas(df, schema=writer.schema, preserve_index=False)
+
+            writer.write_table(table)
+            rows += len(df)
+
+    finally:
+        if writer is not None: 
+            writer.close()
+
+    #no rows were streamed, such as from a download with only the Total row, so save an empty 
+    #typed file the same way as the non-streamed path
+    if writer is None:
+        df = set_dtypes(split_each_column(file_raw, cols_new, cols_keep))
+        df.to_parquet(file_working, index=False)
+
+    return rows
  
+def set_dtypes(df):
+    """
+    Converts any 'Passport' or 'Date' columns to pandas datetime columns, and casts any columns 
+    found in working_dtypes to their explicit types, so the working file keeps the same typed 
+    columns whether it is freshly cleaned, streamed in chunks or read back from cache.
+
+    Args:
+        df (pandas.DataFrame): dataframe returned by split_frame().
+
+    Returns:
+        pandas.DataFrame: with typed columns.
+    """
+
+    #set date columns to datetime
+    if 'Passport' in df.columns: 
+        df['Passport'] = df['Passport'].map(lambda x: pd.to_datetime(x, errors='coerce'))
+        
+    if 'Date' in df.columns:
+        df['Date'] = df['Date'].map(lambda x: pd.to_datetime(x))
+
+    dtypes = {col: dtype for col, dtype in working_dtypes.items() if col in df.columns}
+    return set_codes(df.astype(dtypes))
+
+def set_codes(df):
+    """
+    Sets categories of any code columns found in code_categories, so known codes come first and 
+    keep the same integer codes across chunks, files and runs, with other codes sorted after.
+
+    Args:
+        df (pandas.DataFrame): dataframe with code columns.
+
+    Returns:
+        pandas.DataFrame: with categorical code columns.
+    """
+
+    for col, known in code_categories.items():
+        if col not in df.columns: continue
+        values = df[col].astype('category')
+        other = sorted(set(values.cat.categories) - set(known))
+        df[col] = values.cat.set_categories(known + other)
+
+    return df
+
 def clean(file_raw,
           file_working, 
           cols_new = ['ID', 'Status', 'Passport', 'Date', 'Type', 'Page'],
-          cols_keep = ['Count', 'Amount']):     
+          cols_keep = ['Count', 'Amount'],
+          file_export=None,
+          chunk_size=INGEST_CHUNK_SIZE):     
     """
-    First checks whether file_working exists, and if so a dataframe is returned from that. If not:
-        -file_raw is run through helpers.split_each_column() to create a dataframe   
+    First checks whether file_working exists and was built from the same file_raw contents, 
+    columns and any merged delta files, and if so a dataframe is returned from that, also saving
+    the file_export copy if it's missing. If not:
+        -file_raw is run through helpers.split_each_column() to create a dataframe, or if 
+         chunk_size is set, is streamed in chunks through helpers.stream_each_column()
         -any 'Passport' or 'Date' columns are converted to a pandas datetime column
-        -a working Excel file, with '-working' appended to the name, is saved 
+        -columns are cast to the types in working_dtypes
+        -a typed Parquet working file, with '-working' appended to the name, is saved
+        -if file_export is set, a human-readable Excel copy of the working file is also saved 
+        -a fingerprint of file_raw and the columns is saved to the manifest
     
     Args:
         file_raw (str): path to Excel spreadsheet to read raw data from. 
-        file_working (str): path to cached Excel spreadsheet, if data has been initially cleaned. 
+        file_working (str): path to cached Parquet file, if data has been initially cleaned. 
         cols_new (List[str]): columns that spreadsheet's 'Each--' column will be split into.
         cols_keep (List[str]): spreadsheet columns that will be kept.  
+        file_export (str): optional path to save an Excel copy of the working file to.
+        chunk_size (int): number of rows to stream at a time, or None to read file_raw at once.
 
     Returns:
         pandas.DataFrame: from either a cached working file or newly cleaned data. 
@@ -108,26 +318,116 @@ def clean(file_raw,
     
     print('\nGETTING CLEAN DATA ...')     
     
-    #use working file if it exists    
-    if os.path.isfile(file_working):         
-        df = pd.read_excel(file_working) 
+    #use working file if it exists and is current
+    deltas = get_deltas(file_working)
+    inputs = fingerprint([file_raw] + deltas, cols_new=cols_new, cols_keep=cols_keep, deltas=deltas)
+    if is_current(file_working, inputs):         
+        df = set_codes(pd.read_parquet(file_working)) 
         print('\nUSING WORKING DF')        
+
+        #save optional human-readable copy if it's missing
+        if file_export and not os.path.isfile(file_export):
+            with pd.ExcelWriter(file_export, engine='xlsxwriter') as writer:
+                df.to_excel(writer, sheet_name='Sheet1', index=False)
     
     #else clean raw file and return df
     else:
-        df = split_each_column(file_raw, cols_new, cols_keep)
-
-        #set date columns to datetime
-        if 'Passport' in cols_new: 
-            df['Passport'] = df['Passport'].map(lambda x: pd.to_datetime(x, errors='coerce'))
-            
-        if 'Date'  in cols_new:
-            df['Date'] = df['Date'].map(lambda x: pd.to_datetime(x))
-        
-        #save working file
-        with pd.ExcelWriter(file_working, engine='xlsxwriter') as writer:
-            df.to_excel(writer, sheet_name='Sheet1', index=False)
+        if chunk_size:
+            stream_each_column(file_raw, file_working, cols_new, cols_keep, chunk_size)
+            df = set_codes(pd.read_parquet(file_working))
+
+        else:
+            df = set_dtypes(split_each_column(file_raw, cols_new, cols_keep))
+            df.to_parquet(file_working, index=False)
+
+        #save optional human-readable copy
+        if file_export:
+            with pd.ExcelWriter(file_export, engine='xlsxwriter') as writer:
+                df.to_excel(writer, sheet_name='Sheet1', index=False)
 
+        #a fresh working file starts without any deltas merged in
+        record(file_working, fingerprint([file_raw], cols_new=cols_new, cols_keep=cols_keep, deltas=[]))
         print('\nUSING FRESH DF')
 
     return df    
+
+def add_flags(df, flags):
+    """
+    Sets pledge flag columns to 1 or 0 using whole-column operations, and assigns them all at once:
+        -'Major' is 1 if the pledge has a major donor code
+        -'Passport' is 1 if Passport was activated within the 1-year pledge window 
+        -all other flags are 1 if their source column in flag_columns has a matching value
+
+    Args:
+        df (pandas.DataFrame): working data from clean().
+        flags (List[str]): flag columns to set, from 'Major', 'Passport' or flag_columns keys.
+
+    Returns:
+        pandas.DataFrame: with flag columns added or replaced.
+    """
+
+    values = {}
+    for flag in flags:
+        if flag == 'Major':
+            values[flag] = df['Major'].notna()
+        elif flag == 'Passport':
+            #match 1-yr pledge window
+            values[flag] = (df['Passport'] - pd.offsets.DateOffset(years=1)) < df['Date']
+        else:
+            col, matches = flag_columns[flag]
+            #compare integer codes rather than strings
+            codes = df[col].cat.categories.get_indexer(matches)
+            values[flag] = pd.Series(np.isin(df[col].cat.codes, codes[codes >= 0]), index=df.index)
+
+    return df.assign(**{flag: value.astype('int64') for flag, value in values.items()})
+
+def merge_delta(file_raw,
+                file_delta,
+                file_working,
+                cols_new = ['ID', 'Status', 'Passport', 'Date', 'Type', 'Page'],
+                cols_keep = ['Count', 'Amount'],
+                file_export=None,
+                keys=['ID', 'Date', 'Type', 'Page']):
+    """
+    Merges a delta download from Allegiance, covering only recent pledges, into the working file:
+        -the working file is fetched or created with clean()
+        -file_delta is run through helpers.split_each_column() and typed like the working file 
+        -working rows with the same pledge keys as delta rows are replaced by the delta rows
+        -the working file is saved, and file_delta is added to its deltas in the manifest
+
+    Args:
+        file_raw (str): path to Excel spreadsheet the working file was built from. 
+        file_delta (str): path to Excel spreadsheet with the delta download. 
+        file_working (str): path to cached Parquet working file. 
+        cols_new (List[str]): columns that spreadsheet's 'Each--' column will be split into.
+        cols_keep (List[str]): spreadsheet columns that will be kept.  
+        file_export (str): optional path to save an Excel copy of the working file to.
+        keys (List[str]): columns that identify a pledge.
+
+    Returns:
+        numpy.ndarray: IDs of donors with pledges in the delta download.
+    """
+
+    df = clean(file_raw, file_working, cols_new, cols_keep, file_export)
+
+    print('\nMERGING DELTA:', file_delta)
+    df_delta = set_dtypes(split_each_column(file_delta, cols_new, cols_keep))
+
+    #replace existing pledges with delta pledges, and add new ones
+    keys_working = pd.MultiIndex.from_frame(df[keys])
+    keys_delta = pd.MultiIndex.from_frame(df_delta[keys])
+    replaced = keys_working.isin(keys_delta)
+    added = (~keys_delta.unique().isin(keys_working)).sum() #count repeated delta keys once
+    df = set_codes(pd.concat([df[~replaced], df_delta], ignore_index=True))
+    print('\nPLEDGES REPLACED:', replaced.sum(), ' ADDED:', added)
+    
+    df.to_parquet(file_working, index=False)
+    if file_export:
+        with pd.ExcelWriter(file_export, engine='xlsxwriter') as writer:
+            df.to_excel(writer, sheet_name='Sheet1', index=False)
+
+    deltas = get_deltas(file_working) + [file_delta]
+    record(file_working, 
+           fingerprint([file_raw] + deltas, cols_new=cols_new, cols_keep=cols_keep, deltas=deltas))
+
+    return df_delta['ID'].unique()
@@ -1,11 +1,15 @@
+import os
 import sys
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 import pandas as pd
-from .helpers import clean
+from .cache import record
+from .pledges import get_pledges, get_fingerprint
 from src import (
     DATA_DONORS_RAW, 
     DATA_DONORS_WORKING,
+    DATA_DONORS_WORKING_EXPORT,
+    DATA_DONORS_PLEDGES,
     DATA_DONORS_NEW_PROCESSED,
     DATA_START, 
     DATA_END, 
@@ -15,27 +19,33 @@ from src import (
 def process_data(
     data_file_raw=DATA_DONORS_RAW,
     data_file_working=DATA_DONORS_WORKING,
+    data_file_export=DATA_DONORS_WORKING_EXPORT,
+    data_file_pledges=DATA_DONORS_PLEDGES,
     data_file_processed=DATA_DONORS_NEW_PROCESSED,
     date_start=DATA_START,
     date_end=DATA_END,
-    year_cutoff=YEAR_CUTOFF
+    year_cutoff=YEAR_CUTOFF,
+    ids=None
 ):
     """
-    Gets member donation data file and then:
-        -filters by date_start and date_end
+    Gets pledge data from src.process.pledges.get_pledges(), which filters by date_start and 
+    date_end and transforms variables to continuous values, and then:
         -filters by new donors up to a year before date_end, but includes all donations they made
          through date_end 
-        -transforms variables to continuous values 
         -aggregate accounts with multiple pledges, on ['ID', 'Date'] 
         -saves csv file to data_file_processed        
 
     Args:
         data_file_raw (str): path to raw Excel file to start with.
-        data_file_working (str): path to working Excel file if raw file has been initially cleaned.
+        data_file_working (str): path to working Parquet file if raw file has been initially cleaned.
+        data_file_export (str): optional path to save an Excel copy of the working file to.
+        data_file_pledges (str): path to pledge data Parquet file shared with other processing.
         data_file_processed (str): path to where to save final csv file output.
         date_start (str): for date range filter, is inclusive, in format 2019-10-01.
         date_end (str): for date range filter, is inclusive, in format 2022-09-30.
         year_cutoff (str): where to cutoff year timeframe, is inclusive, defaults to fy.                    
+        ids (List[int]): if set, and data_file_processed exists, only these donors are reprocessed 
+            and their rows replaced in data_file_processed, such as after merging a delta download.
     
     Returns:
         int: 0 to indicate success.
@@ -49,21 +59,25 @@ def process_data(
     print('\n\nRUNNING src/process/new_donors.py process_data\n')
 
     # ===================================
-    # get and clean member data
+    # get pledge data, filtered by date_start and date_end and transformed to continuous values
     # ===================================
    
-    cols_new = ['ID', 'Status', 'Sustainer', 'Major', 'Passport', 'Date', 'Type', 'Gift', 'Page']
-    cols_keep = ['Count', 'Paid to Date', 'Balance']
-    df = clean(data_file_raw, data_file_working, cols_new, cols_keep)
+    df = get_pledges(data_file_raw, 
+                     data_file_working, 
+                     data_file_export, 
+                     data_file_pledges, 
+                     date_start, 
+                     date_end, 
+                     year_cutoff)
     #print('\n', df.tail())    
 
-    # ===================================
-    # filter by date_start and date_end
-    # ===================================
-    
+    #only reprocess select donors if processed data already exists 
+    incremental = ids is not None and os.path.isfile(data_file_processed)
+    if incremental:
+        df = df[df['ID'].isin(ids)]
+        print('\nREPROCESSING DONORS:', len(ids))
+
     print('\nDF SHAPE BEFORE FILTERS: ', df.shape)
-    df = df[(df['Date'] >= date_start) & (df['Date'] <= date_end)]
-    #print('\n', df.tail())
 
     # ==================================================
     # filter by new donors up to a year before date_end, but include all donations 
@@ -73,7 +87,7 @@ def process_data(
     ids_all = df['ID'].unique()
     print('\nALL DONORS:', len(ids_all))
     
-    df1 = df[df['Type'] == 'NEW']
+    df1 = df[df['New'] == 1]
     print('TEST df1', len(df1))
 
     print('df1', df1['ID'].unique().size)   
@@ -84,7 +98,7 @@ def process_data(
     date_end_year_before = date_year_before_obj.strftime('%Y-%m-%d') 
 
     #keep new donors up to date_end_year_before, but all their activity through date_end
-    df_new = df[(df['Type'].str.strip() == 'NEW')
+    df_new = df[(df['New'] == 1)
                 & (df['Date'] <= date_end_year_before)]
     ids_new = df_new['ID'].unique()
     df = df[df['ID'].isin(ids_new)] 
@@ -92,28 +106,14 @@ def process_data(
     print('\nNEW DONORS:', len(ids_new))
     #print('\nDF TAIL AFTER FILTERS:\n\n', df.tail)    
 
-    
-    # ====================================================
-    # transform variables to continuous values
-    # ====================================================
-
-    #convert fields
-    df['Status'] = df['Status'].map(lambda x: 1 if x.strip() == 'MEMB' else 0) 
-    df['Passport'] = df['Passport'] - pd.offsets.DateOffset(years=1) #match 1-yr pledge window
-    df['Passport'] = df.apply(lambda x: 1 if x['Passport'] < x['Date'] else 0, axis=1)
-    df['Date'] = pd.to_datetime(df['Date']).dt.to_period(year_cutoff) #set to a year
-    df['Gift'] = df['Gift'].map(lambda x: 1 if x.strip() == 'YES' else 0)
-
-    #add new fields
-    df['Payments'] = df['Paid to Date'] + df['Balance'] #add paid and balance  
 
     #keep select fields
-    df = df[['ID', 'Status', 'Passport', 'Date', 'Gift', 'Payments']]
+    df = df[['ID', 'Status', 'Passport', 'Year', 'Gift', 'Payments']]
 
     print('\n', df.tail)
 
     # ====================================================
-    # aggregate accounts with multiple pledges, on ['ID', 'Date']   
+    # aggregate accounts with multiple pledges, on ['ID', 'Year']   
     # ====================================================
     
     print('BEFORE', len(df)) 
@@ -125,18 +125,26 @@ def process_data(
         'Gift': 'max',    
     }
 
-    df = df.groupby(['ID', 'Date']).agg(aggreg)
+    df = df.groupby(['ID', 'Year']).agg(aggreg)
     df = df.reset_index()
     df = df.set_index('ID')
-    df = df.rename(columns={'Payments':'Total_Payments', 'Date':'Years'})
+    df = df.rename(columns={'Payments':'Total_Payments', 'Year':'Years'})
 
     print('\n', df.tail)
 
     # ====================================================
-    # save prepped copy  
+    # save prepped copy, replacing rows of reprocessed donors if incremental
     # ====================================================
 
+    if incremental:
+        df_saved = pd.read_csv(data_file_processed, index_col='ID')
+        df_saved['Years'] = pd.PeriodIndex(df_saved['Years'].astype(str), freq=year_cutoff)
+        df = pd.concat([df_saved[~df_saved.index.isin(ids)], df])
+        df = df.reset_index().sort_values(['ID', 'Years']).set_index('ID')
+
     df.to_csv(data_file_processed)
+    record(data_file_processed, 
+           get_fingerprint(data_file_raw, data_file_working, date_start, date_end, year_cutoff))
     return 0
 
 if __name__ == '__main__': 
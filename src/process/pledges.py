@@ -0,0 +1,184 @@
+import os
+import numpy as np
+import pandas as pd
+from .cache import fingerprint, get_deltas, is_current, record
+from .helpers import clean, add_flags
+from src import (
+    DATA_DONORS_RAW,
+    DATA_DONORS_WORKING,
+    DATA_DONORS_WORKING_EXPORT,
+    DATA_DONORS_PLEDGES,
+    DATA_START,
+    DATA_END,
+    YEAR_CUTOFF
+)
+
+def get_fingerprint(
+    data_file_raw=DATA_DONORS_RAW,
+    data_file_working=DATA_DONORS_WORKING,
+    date_start=DATA_START,
+    date_end=DATA_END,
+    year_cutoff=YEAR_CUTOFF
+):
+    """
+    Gets fingerprint of the raw data file, any delta files merged into the working file, and
+    parameters that pledge data and processed donors data are built from, to check whether
+    saved files are current.
+
+    Args:
+        data_file_raw (str): path to raw Excel file to start with.
+        data_file_working (str): path to working Parquet file that delta files are merged into.
+        date_start (str): for date range filter, is inclusive, in format 2019-10-01.
+        date_end (str): for date range filter, is inclusive, in format 2022-09-30.
+        year_cutoff (str): where to cutoff year timeframe, is inclusive, defaults to fy.
+
+    Returns:
+        dict: fingerprint from src.process.cache.fingerprint().
+    """
+    return fingerprint([data_file_raw] + get_deltas(data_file_working),
+                       date_start=date_start,
+                       date_end=date_end,
+                       year_cutoff=year_cutoff)
+
+def transform(df, date_start=DATA_START, date_end=DATA_END, year_cutoff=YEAR_CUTOFF):
+    """
+    Transforms working data to pledge data, row by row:
+        -filters by start and end dates
+        -transforms variables to continuous flag columns with add_flags()
+        -adds Year column, setting Date to a year with year_cutoff
+        -adds Payments column, as paid plus balance
+
+    Args:
+        df (pandas.DataFrame): working data from clean().
+        date_start (str): for date range filter, is inclusive, in format 2019-10-01.
+        date_end (str): for date range filter, is inclusive, in format 2022-09-30.
+        year_cutoff (str): where to cutoff year timeframe, is inclusive, defaults to fy.
+
+    Returns:
+        pandas.DataFrame.
+    """
+
+    # ===================================
+    # filter by date range
+    # ===================================
+
+    df = df[(df['Date'] >= date_start) & (df['Date'] <= date_end)]
+
+    # ==================================================
+    # transform variables to continuous values
+    # ==================================================
+
+    flags = ['Status', 'Sustainer', 'Major', 'Passport', 'Gift', 'Rejoin', 'Renew', 'Add', 'New', 'Online']
+    df = add_flags(df, flags)
+    df['Year'] = df['Date'].dt.to_period(year_cutoff) #set to a year
+    df['Payments'] = df['Paid to Date'] + df['Balance'] #add paid and balance
+
+    return df[['ID', 'Date', 'Year', 'Type', 'Page', 'Count', 'Payments'] + flags]
+
+def update_pledges(df, df_pledges, ids, date_start=DATA_START, date_end=DATA_END, year_cutoff=YEAR_CUTOFF):
+    """
+    Updates pledge data for donors in ids only, such as after merging a delta download, so only
+    their pledges are transformed. Pledges of other donors are kept from df_pledges, and rows 
+    are put in the same order as transforming all of df.
+
+    Args:
+        df (pandas.DataFrame): working data from clean(), with delta downloads merged in.
+        df_pledges (pandas.DataFrame): pledge data from before delta downloads were merged in.
+        ids (List[int]): donors with pledges in delta downloads.
+        date_start (str): for date range filter, is inclusive, in format 2019-10-01.
+        date_end (str): for date range filter, is inclusive, in format 2022-09-30.
+        year_cutoff (str): where to cutoff year timeframe, is inclusive, defaults to fy.
+
+    Returns:
+        pandas.DataFrame, or None if df_pledges doesn't match df for other donors.
+    """
+    df = df[(df['Date'] >= date_start) & (df['Date'] <= date_end)]
+    updated = df['ID'].isin(ids).to_numpy()
+    df_pledges = df_pledges[~df_pledges['ID'].isin(ids)]
+    if len(df_pledges) != (~updated).sum():
+        return None
+
+    df_updated = transform(df[updated], date_start, date_end, year_cutoff)
+    df_pledges = df_pledges.astype(df_updated.dtypes.to_dict())
+
+    #put rows back in working data order
+    positions = np.concatenate([np.flatnonzero(~updated), np.flatnonzero(updated)])
+    df = pd.concat([df_pledges, df_updated], ignore_index=True)
+    return df.iloc[np.argsort(positions)].reset_index(drop=True)
+
+def get_pledges(
+    data_file_raw=DATA_DONORS_RAW,
+    data_file_working=DATA_DONORS_WORKING,
+    data_file_export=DATA_DONORS_WORKING_EXPORT,
+    data_file_pledges=DATA_DONORS_PLEDGES,
+    date_start=DATA_START,
+    date_end=DATA_END,
+    year_cutoff=YEAR_CUTOFF,
+    ids=None
+):
+    """
+    Gets pledge data, where each row is a donor pledge, that both src.process.donors and
+    src.process.new_donors aggregate from. If data_file_pledges is not current, or the working 
+    file or its export is missing, it is rebuilt:
+        -gets working data with clean()
+        -transforms working data to pledges with transform(), or if ids is set, only pledges 
+         of those donors with update_pledges()
+        -saves to data_file_pledges
+
+    Args:
+        data_file_raw (str): path to raw Excel file to start with.
+        data_file_working (str): path to working Parquet file if raw file has been initially cleaned.
+        data_file_export (str): optional path to save an Excel copy of the working file to.
+        data_file_pledges (str): path to where to save pledge data as a Parquet file.
+        date_start (str): for date range filter, is inclusive, in format 2019-10-01.
+        date_end (str): for date range filter, is inclusive, in format 2022-09-30.
+        year_cutoff (str): where to cutoff year timeframe, is inclusive, defaults to fy.
+        ids (List[int]): if set, and data_file_pledges was current before delta downloads were 
+            merged, only pledges of these donors are transformed again.
+
+    Returns:
+        pandas.DataFrame.
+
+    References for @year_cutoff:
+      -https://pandas.pydata.org/pandas-docs/stable/user_guide/timeseries.html
+      -https://stackoverflow.com/questions/22205159/format-pandas-datatime-object-to-show-fiscal-years-from-feb-to-feb-and-be-format
+    """
+
+    inputs = get_fingerprint(data_file_raw, data_file_working, date_start, date_end, year_cutoff)
+
+    #rebuild if the working file or its export is missing, so clean() recreates them
+    working_exists = os.path.isfile(data_file_working) and \
+        (not data_file_export or os.path.isfile(data_file_export))
+    if working_exists and is_current(data_file_pledges, inputs):
+        print('\nUSING PLEDGES DF')
+        return pd.read_parquet(data_file_pledges)
+
+    # ===================================
+    # get and clean member data
+    # ===================================
+
+    cols_new = ['ID', 'Status', 'Sustainer', 'Major', 'Passport', 'Date', 'Type', 'Gift', 'Page']
+    cols_keep = ['Count', 'Paid to Date', 'Balance']
+    df_working = clean(data_file_raw, data_file_working, cols_new, cols_keep, data_file_export)
+
+    # ===================================
+    # transform only select donors if pledge data already exists, or else all donors
+    # ===================================
+
+    df = None
+    if ids is not None and os.path.isfile(data_file_pledges):
+        df = update_pledges(df_working, pd.read_parquet(data_file_pledges), ids, 
+                            date_start, date_end, year_cutoff)
+        print('\nUPDATING PLEDGES OF DONORS:', len(ids))
+
+    if df is None:
+        df = transform(df_working, date_start, date_end, year_cutoff)
+    print('\nPLEDGES:', df.shape)
+
+    # ===================================
+    # save pledges copy
+    # ===================================
+
+    df.to_parquet(data_file_pledges, index=False)
+    record(data_file_pledges, inputs)
+    return df
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+#categories in alphabetical order, so grouping and pivoting sort the same as with strings
+categories = ['Both', 'Gift', 'Neither', 'Passport']
+
+#codes from Passport flag + Gift flag * 2, to positions in categories
+categories_codes = np.array([
+    categories.index('Neither'),
+    categories.index('Passport'),
+    categories.index('Gift'),
+    categories.index('Both')
+])
+
+def get_categories(passport, gift):
+    """
+    Gets category for each row based on Passport and Gift flags, building a bit-coded category
+    in one array operation instead of row by row:
+        0: Neither
+        1: Passport
+        2: Gift
+        3: Both
+
+    Any value other than 0 counts as a flag, so flags can also be averages, such as from
+    data/processed/<NAME>-donors.csv.
+
+    Args:
+        passport (pandas.Series): Passport flags.
+        gift (pandas.Series): Gift flags.
+
+    Returns:
+        pandas.Categorical: category for each row, with categories Both, Gift, Neither and Passport.
+    """
+    codes = (np.asarray(passport) != 0).astype(np.int8) + (np.asarray(gift) != 0) * 2
+    return pd.Categorical.from_codes(categories_codes[codes], categories=categories)
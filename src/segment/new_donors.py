@@ -1,14 +1,46 @@
 import os
 import sys
+import argparse
 from src import DATA_DONORS_NEW_PROCESSED
 from src.helpers import get_output_dir
-from src.process.new_donors import process_data
+from src.process.cache import is_current
+from src.process.new_donors import process_data, get_fingerprint
+from src.process.pledges import get_pledges
+from src.timeline.helpers import get_time_frequency
+from .helpers import categories, get_categories
+import numpy as np
 import pandas as pd
 
+def parse_args():
+    """
+    Parses command-line argument for length of periods to segment new donors by. Options include:
+        -annual
+        -monthly
+        -weekly
+
+    Examples:
+        $ python -m src.segment.new_donors 
+        $ python -m src.segment.new_donors monthly
+
+    Returns:
+        str: time period specified by the user.
+    """
+    parser = argparse.ArgumentParser(description='Run segment new donors module')
+    parser.add_argument(
+        'frequency',
+        type=str,
+        nargs='?',
+        default='annual',
+        choices=['annual', 'monthly', 'weekly'],
+        help='Specify length of periods to segment new donors by, e.g. annual, monthly or weekly'
+    )
+    arg, unknown = parser.parse_known_args()
+    return arg.frequency
+
 def get_data(data_file_processed=DATA_DONORS_NEW_PROCESSED):
     """
     Gets data from data/processed/donors-new.csv, running process_data() first if it 
-    doesn't exist, and returning a pandas.DataFrame.
+    doesn't exist or is stale, and returning a pandas.DataFrame.
 
     Arg:
         data_file_processed (str): path to where csv data file is or will be.               
@@ -17,31 +49,139 @@ def get_data(data_file_processed=DATA_DONORS_NEW_PROCESSED):
         pandas.DataFrame.
     """
 
-    #create processed data if it doesn't exist
-    if not os.path.isfile(data_file_processed):
+    #create processed data if it doesn't exist, or raw data or parameters have changed
+    if not is_current(data_file_processed, get_fingerprint()):
         process_data()
 
     df = pd.read_csv(data_file_processed) 
     return df 
 
-def segment(df, output_dir):
+def get_periods(df, frequency):
+    """
+    Gets new donors data with a row per donor per month or week, instead of per year, by
+    aggregating their pledges from src.process.pledges.get_pledges().
+
+    Args:
+        df (pandas.DataFrame): data from data/processed/<NAME>-donors-new.csv, to get new donors from.
+        frequency (str): monthly or weekly.
+
+    Returns:
+        pandas.DataFrame: with period column named Months or Weeks.
+    """
+    period_col = {'monthly': 'Months', 'weekly': 'Weeks'}[frequency]
+    pledges = get_pledges()
+    pledges = pledges[pledges['ID'].isin(df['ID'].unique())]
+    periods = pledges['Date'].dt.to_period(get_time_frequency(frequency))
+    pledges = pledges.assign(**{period_col: periods})
+
+    aggreg = {'Payments': 'sum', 'Status': 'max', 'Passport': 'max', 'Gift': 'max'}
+    df = pledges.groupby(['ID', period_col]).agg(aggreg).reset_index()
+    return df.rename(columns={'Payments':'Total_Payments'})
+
+def get_cohorts(df, period_col='Years'):
+    """
+    Gets totals for each donor since each period, in one pass instead of re-filtering and 
+    re-grouping donors for every period:
+        -donor rows are sorted from latest to earliest period, so running sums and maxes give 
+         each donor's totals since each period they were active
+        -a donor's row also holds their totals since any earlier period they weren't active, 
+         back to their previous active period, so each row is repeated for those periods
+        -each donor is assigned a category of: 'Neither', 'Passport', 'Gift', or 'Both', 
+         based on Passport and Gift flags
+
+    Args:
+        df (pandas.DataFrame): data from data/processed/<NAME>-donors-new.csv, with a row per 
+            donor per period.  
+        period_col (str): name of period column, such as Years.
+
+    Returns:
+        tuple:
+            pandas.DataFrame: a row per donor per period they were active since, sorted by
+                Since and ID, where Since is the position of the period in periods.
+            numpy.ndarray: sorted periods, not including the last period.
     """
-    Each year of data is iterated over:
-        -The first year includes all new donors over all years, and each donors donations over all 
-         years are aggregated, including renewals and add gifts, and their years of donations counted.
-        -The next year excludes new donors from the previous year, as well as their subsequent donations
-         over all years.
-        -This is repeated for each year. 
+
+    #make sure there is one row per donor per period
+    agg_periods = {'Total_Payments':'sum', 'Status':'max', 'Passport':'max', 'Gift':'max'}
+    df = df.groupby(['ID', period_col]).agg(agg_periods).reset_index()
+    codes, periods = pd.factorize(df[period_col], sort=True)
+    last = len(periods) - 2 #don't include last period
+
+    #sort by donor and then latest period first, to total each donor from each period onward
+    order = np.lexsort((-codes, df['ID'].to_numpy()))
+    df = df.iloc[order].reset_index(drop=True)
+    codes = codes[order]
+    grouped = df.groupby('ID', sort=False)
+    totals = {
+        'Total_Payments': grouped['Total_Payments'].cumsum().to_numpy(),
+        'Status': grouped['Status'].cummax().to_numpy(),
+        'Passport': grouped['Passport'].cummax().to_numpy(),
+        'Gift': grouped['Gift'].cummax().to_numpy(),
+        period_col: grouped.cumcount().to_numpy() + 1
+    }
+
+    #each row holds totals since periods after the donor's previous active period, up to its own
+    ids = df['ID'].to_numpy()
+    same_donor = np.append(ids[1:] == ids[:-1], False)
+    previous = np.where(same_donor, np.append(codes[1:], -1), -1)
+    starts = previous + 1
+    lengths = np.maximum(np.minimum(codes, last) - starts + 1, 0)
+
+    #repeat each row for each period it covers
+    rows = np.repeat(np.arange(len(df)), lengths)
+    offsets = np.arange(len(rows)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    cohorts = pd.DataFrame({'Since': starts[rows] + offsets, 'ID': ids[rows]})
+    for col, values in totals.items():
+        cohorts[col] = values[rows]
+
+    #categorize donors
+    cohorts['Category'] = get_categories(cohorts['Passport'], cohorts['Gift'])
+
+    cohorts = cohorts.sort_values(['Since', 'ID'], kind='stable', ignore_index=True)
+    return cohorts, np.asarray(periods[:-1])
+
+def get_label(period):
+    """
+    Gets label for a period to use in file and column names.
+
+    Arg:
+        period (int or pandas.Period): year, or monthly or weekly period.
+
+    Returns:
+        str: year, such as 2020, month, such as 2020-01, or first day of week, such as 2020-01-06.
+    """
+    if not isinstance(period, pd.Period):
+        return str(int(period))
+
+    if period.freqstr.startswith('W'):
+        return period.start_time.strftime('%Y-%m-%d')
+
+    return str(period)
+
+def segment(df, output_dir, period_col='Years', save_assignments=True, groups_file='groups.csv'):
+    """
+    Each period of data, except for the last, is iterated over:
+        -The first period includes all new donors over all periods, and each donors donations over all 
+         periods are aggregated, including renewals and add gifts, and their periods of donations counted.
+        -The next period excludes new donors from the previous period, as well as their subsequent donations
+         over all periods.
+        -This is repeated for each period. 
+
+    Totals for all periods are computed in one pass with get_cohorts(), so finer monthly or weekly 
+    periods don't multiply the work.
 
     Output:
-        -For each year's iteration, each donor is assigned a category of: 'Neither', 'Passport', 'Gift', 
-         or 'Both' based on Passport and Gift flags, and the data is saved to to assignments_<year>.csv.
-        -For each year's iteration, assignments are aggregated by categories and appended to a dataframe 
-         accumulator. When the iterations finishes, the dataframe acculator is saved to groups.csv.     
+        -For each period's iteration, each donor is assigned a category of: 'Neither', 'Passport', 'Gift', 
+         or 'Both' based on Passport and Gift flags, and the data is saved to to assignments_<period>.csv.
+        -For each period's iteration, assignments are aggregated by categories and appended to a dataframe 
+         accumulator. When the iterations finishes, the dataframe acculator is saved to groups_file.     
             
     Args:
-        df (pandas.DataFrame): data from data/processed/<NAME>-donors.csv.  
+        df (pandas.DataFrame): data from data/processed/<NAME>-donors-new.csv.  
         output_dir (str): path to output directory.          
+        period_col (str): name of period column, such as Years.
+        save_assignments (bool): whether to save assignments_<period>.csv files. 
+        groups_file (str): name of file to save category averages to.
 
     Returns:
         None.       
@@ -51,65 +191,65 @@ def segment(df, output_dir):
     print('\nDONORS:', df['ID'].unique().size)
     print('\n', df.tail(15))
 
-    categories_map = {0: 'Neither', 1: 'Passport', 2: 'Gift', 3: 'Both'}
+    #create accumulator columns, and aggreg dict to group categories 
+    index = categories
+    agg_catagories = {'Total_Payments':'sum', 'Status':'mean', 'Passport':'mean', 'Gift':'mean', period_col: 'sum'}
+    prefix = 'Ann' if period_col == 'Years' else 'Avg'
+    cols_groups = []
 
-    def set_category_col(a, b):
-        c = 0 if a == 0 else 1
-        d = 0 if b == 0 else 2 
-        return c + d
+    #get totals for each donor from each period to last period in data 
+    cohorts, periods = get_cohorts(df, period_col)
 
-    #create accumulator df, and aggreg dict to group donors, and aggreg dict to group categories 
-    df_groups = pd.DataFrame(index=list(categories_map.values()))
-    print('\n', df_groups.tail(15))
+    #get donor category averages
+    #annual payments = sum of donor payments per category / sum of donor years paying
+    groups = cohorts.groupby(['Since', 'Category'], observed=True).agg(agg_catagories)  
+    groups['Annual_Payments'] = groups['Total_Payments'] / groups[period_col]
+    groups['Frequencies'] = cohorts.groupby(['Since', 'Category'], observed=True).size()
 
-    df_groups.sort_index(inplace=True)
-    agg_donors = {'Total_Payments':'sum', 'Status':'max', 'Passport':'max', 'Gift':'max', 'Years': 'nunique'}
-    agg_catagories = {'Total_Payments':'sum', 'Status':'mean', 'Passport':'mean', 'Gift':'mean', 'Years': 'sum'}
+    for since, donors in cohorts.groupby('Since', sort=True):
+        label = get_label(periods[since])
+        donors = donors.drop(columns='Since').set_index('ID')
 
-    #for each year, create totals from that year to last year in data 
-    years = df['Years'].sort_values().unique()
-    first_iteration = True
-    for year in years[:-1]: #don't loop last year
-        #filter years and aggregate donors accross those years 
-        df_temp = df[df['Years'] >= year]
-        donors = df_temp.groupby('ID').agg(agg_donors)             
-        
-        #categorize donors
-        donors['Category'] = donors.apply(lambda x: set_category_col(x['Passport'], x['Gift']), axis=1)
-        donors['Category'] = donors['Category'].map(categories_map)
-        donors.to_csv(os.path.join(output_dir, 'assignments_' +  str(int(year)) + '.csv'))
-
-        #if first iteration, save generically named duplicate file
-        if first_iteration:
-            donors.to_csv(os.path.join(output_dir, 'assignments.csv'))
-            first_iteration = False  
-        
-        #get donor category averages
-        #annual payments = sum of donor payments per category / sum of donor years paying
-        group = donors.groupby('Category').agg(agg_catagories)  
-        group['Annual_Payments'] = group['Total_Payments'] / group['Years']
-        group['Frequencies'] = donors.groupby('Category').size()
+        if save_assignments:
+            donors.to_csv(os.path.join(output_dir, 'assignments_' + label + '.csv'))
+
+            #if first iteration, save generically named duplicate file
+            if since == 0:
+                donors.to_csv(os.path.join(output_dir, 'assignments.csv'))
         
-        print('\n\nGROUP FOR', year, '-', len(donors), 'DONORS\n')
+        group = groups.loc[since]
+        print('\n\nGROUP FOR', label, '-', len(donors), 'DONORS\n')
         print(group, '\n')        
         
-        #add to accumulator df_groups
-        group.sort_index(inplace=True)
-        year = str(int(year))
-        df_groups['Total_Pledges_since_' + year] = group['Total_Payments']
-        df_groups['Ann_Pledges_since_' + year] = group['Annual_Payments']
-        df_groups['Status_from_' + year] = group['Status']  
-        df_groups['Freq_since_' + year] = group['Frequencies']          
+        #add to accumulator columns
+        group = group.reindex(index)
+        cols_groups.append(pd.DataFrame({
+            'Total_Pledges_since_' + label: group['Total_Payments'],
+            prefix + '_Pledges_since_' + label: group['Annual_Payments'],
+            'Status_from_' + label: group['Status'],  
+            'Freq_since_' + label: group['Frequencies']
+        }, index=index))
+
+    df_groups = pd.concat(cols_groups, axis=1) if cols_groups else pd.DataFrame(index=index)
 
     print('\n\nGROUP TOTALS', '-', df['ID'].unique().size, 'DONORS\n')
     print(df_groups, '\n')
 
-    df_groups.to_csv(os.path.join(output_dir, 'groups.csv'))
+    df_groups.to_csv(os.path.join(output_dir, groups_file))
 
 def main():    
+    arg = parse_args()
     df = get_data()
     output_dir = get_output_dir('new_donors')
-    segment(df, output_dir)
+
+    if arg == 'annual':
+        segment(df, output_dir)
+
+    #only save category averages for finer periods, rather than a file per month or week
+    else:
+        df = get_periods(df, arg)
+        period_col = 'Months' if arg == 'monthly' else 'Weeks'
+        segment(df, output_dir, period_col, save_assignments=False, groups_file=f'groups_{arg}.csv')
 
 if __name__ == '__main__':
     sys.exit(main())
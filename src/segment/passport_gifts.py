@@ -1,6 +1,7 @@
 import os
 import sys
 from src.helpers import get_data, get_output_dir
+from .helpers import get_categories
 
 def set_categories(df, output_dir=None):
     """
@@ -20,15 +21,7 @@ def set_categories(df, output_dir=None):
         pandas.DataFrame.       
     """
 
-    categories_map = {0: 'Neither', 1: 'Passport', 2: 'Gift', 3: 'Both'}
-
-    def set_category(a, b):
-        c = 0 if a == 0 else 1
-        d = 0 if b == 0 else 2 
-        return c + d
-
-    df['Category'] = df.apply(lambda x: set_category(x['Passport'], x['Gift']), axis=1)
-    df['Category'] = df['Category'].map(categories_map)
+    df['Category'] = get_categories(df['Passport'], df['Gift'])
 
     print('\nDF SHAPE:', df.shape)
     print('\n', df.tail(15))
@@ -66,8 +59,8 @@ def aggregate(df, output_dir):
     }
 
     df = df.drop(['ID'], axis=1)
-    groups = df.groupby('Category').agg(aggreg)   
-    groups['Frequencies'] = df.groupby('Category').size()   
+    groups = df.groupby('Category', observed=True).agg(aggreg)   
+    groups['Frequencies'] = df.groupby('Category', observed=True).size()   
     groups['Annual_Payment'] = groups['Total_Payments'] / groups['Num_Years']
     groups['Annual_Count'] = groups['Total_Count'] / groups['Num_Years']  
     groups = groups.drop(['Total_Count', 'Num_Years', 'Passport', 'Gift'], axis=1)
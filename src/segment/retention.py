@@ -0,0 +1,73 @@
+import os
+import sys
+from src.helpers import get_output_dir
+from .new_donors import parse_args, get_data, get_periods, get_label
+import pandas as pd
+
+def get_retention(df, period_col='Years'):
+    """
+    Builds acquisition cohort by period matrices from new donors data, in one groupby pass:
+        -each donor's cohort is the first period they pledged in
+        -donors counts how many donors from each cohort pledged in each period
+        -rates divides donors by cohort sizes, as share of each cohort retained in each period
+        -revenue sums pledges from each cohort in each period
+
+    Args:
+        df (pandas.DataFrame): data from data/processed/<NAME>-donors-new.csv, or get_periods(),
+            with a row per donor per period.
+        period_col (str): name of period column, such as Years.
+
+    Returns:
+        tuple: pandas.DataFrames of donors, rates and revenue, with cohorts as index and periods
+            as columns.
+    """
+    cohort = df.groupby('ID')[period_col].transform('min').rename('Cohort')
+    grouped = df.groupby([cohort, period_col]).agg(Donors=('ID', 'nunique'),
+                                                   Revenue=('Total_Payments', 'sum'))
+
+    donors = grouped['Donors'].unstack(fill_value=0)
+    revenue = grouped['Revenue'].unstack(fill_value=0)
+    sizes = df.groupby(cohort)['ID'].nunique()
+    rates = donors.div(sizes, axis=0)
+
+    for matrix in (donors, rates, revenue):
+        matrix.index = [get_label(period) for period in matrix.index]
+        matrix.columns = [get_label(period) for period in matrix.columns]
+        matrix.index.name = 'Cohort'
+
+    return donors, rates, revenue
+
+def save_retention(df, frequency, output_dir):
+    """
+    Builds retention matrices at a frequency with get_retention(), and saves them as donors,
+    rates and revenue files, with names ending in _monthly or _weekly for those frequencies.
+
+    Args:
+        df (pandas.DataFrame): data from data/processed/<NAME>-donors-new.csv.
+        frequency (str): 'annual', 'monthly' or 'weekly'.
+        output_dir (str): path to output directory.
+
+    Returns:
+        List[str]: paths to donors, rates and revenue files.
+    """
+    period_col = 'Years'
+    if frequency != 'annual':
+        df = get_periods(df, frequency)
+        period_col = 'Months' if frequency == 'monthly' else 'Weeks'
+
+    donors, rates, revenue = get_retention(df, period_col)
+    print('\n\nRETENTION RATES\n')
+    print(rates, '\n')
+
+    suffix = '' if frequency == 'annual' else '_' + frequency
+    files = []
+    for name, matrix in [('donors', donors), ('rates', rates), ('revenue', revenue)]:
+        files.append(os.path.join(output_dir, name + suffix + '.csv'))
+        matrix.to_csv(files[-1])
+    return files
+
+def main():
+    save_retention(get_data(), parse_args(), get_output_dir('retention'))
+
+if __name__ == '__main__':
+    sys.exit(main())
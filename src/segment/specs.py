@@ -0,0 +1,249 @@
+import os
+import sys
+import ast
+import operator
+import argparse
+from src import SEGMENTS, SEGMENT_AGGREGATES
+from src.helpers import get_data, get_output_dir
+import numpy as np
+import pandas as pd
+
+#operators allowed in segment conditions
+compare_ops = {
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne
+}
+arithmetic_ops = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv
+}
+
+def parse_args():
+    """
+    Parses command-line arguments for names of custom segments in SEGMENTS to run, which
+    defaults to all of them.
+
+    Examples:
+        $ python -m src.segment.specs
+        $ python -m src.segment.specs online_sustainers major_donors
+
+    Returns:
+        List[str]: names of segments specified by the user.
+    """
+    parser = argparse.ArgumentParser(description='Run segment specs module')
+    parser.add_argument(
+        'names',
+        nargs='*',
+        type=str,
+        help='Specify names of segments in SEGMENTS to run, defaults to all'
+    )
+    arg, unknown = parser.parse_known_args()
+    return arg.names
+
+def get_spec(spec):
+    """
+    Gets conditions and aggregations from a segment spec in SEGMENTS.
+
+    Arg:
+        spec (str or dict): conditions, or dict with 'where' conditions and optional 'aggregate'.
+
+    Returns:
+        tuple: conditions string and aggregations dict.
+    """
+    if isinstance(spec, str):
+        return spec, SEGMENT_AGGREGATES
+    return spec['where'], spec.get('aggregate', SEGMENT_AGGREGATES)
+
+def compile_conditions(conditions):
+    """
+    Compiles a conditions string, such as 'Sustainer and Online and Annual_Payment > 120', into
+    a syntax tree, checking that it only uses names, numbers, and, or, not, comparisons and
+    arithmetic. Conditions are never run as Python code.
+
+    Arg:
+        conditions (str): conditions on columns in processed donors data.
+
+    Returns:
+        ast.Expression.
+
+    Raises:
+        ValueError: if conditions have invalid syntax or unsupported parts.
+    """
+    try:
+        tree = ast.parse(conditions, mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f'Invalid segment conditions: {conditions}') from e
+
+    allowed = (ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub,
+               ast.Compare, ast.BinOp, ast.Name, ast.Load, ast.Constant)
+    allowed += tuple(compare_ops) + tuple(arithmetic_ops)
+    for node in ast.walk(tree):
+        if not isinstance(node, allowed):
+            raise ValueError(f'Unsupported {type(node).__name__} in segment conditions: {conditions}')
+
+    return tree
+
+def evaluate(node, columns, cache):
+    """
+    Evaluates a compiled conditions node to a numpy array. Results for each node are cached on
+    its structure, so a column or condition shared by several segments is only evaluated once.
+
+    Args:
+        node (ast.AST): node from compile_conditions().
+        columns (dict): numpy arrays keyed on column names.
+        cache (dict): results of evaluated nodes, shared across segments.
+
+    Returns:
+        numpy.ndarray, or a number for constants.
+
+    Raises:
+        ValueError: if conditions refer to a column that doesn't exist.
+    """
+    if isinstance(node, ast.Expression):
+        return as_mask(evaluate(node.body, columns, cache))
+
+    if isinstance(node, ast.Constant):
+        return node.value
+
+    key = ast.dump(node)
+    if key in cache:
+        return cache[key]
+
+    if isinstance(node, ast.Name):
+        if node.id not in columns:
+            raise ValueError(f'Unknown column in segment conditions: {node.id}')
+        result = columns[node.id]
+
+    elif isinstance(node, ast.BoolOp):
+        masks = [as_mask(evaluate(value, columns, cache)) for value in node.values]
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        result = combine.reduce(masks)
+
+    elif isinstance(node, ast.UnaryOp):
+        operand = evaluate(node.operand, columns, cache)
+        if isinstance(node.op, ast.Not):
+            result = ~as_mask(operand)
+        else:
+            #numpy can't negate booleans, such as from -(Major > 0), so they count as 0 or 1
+            operand = np.asarray(operand)
+            result = -(operand.astype(int) if operand.dtype == bool else operand)
+
+    elif isinstance(node, ast.BinOp):
+        left = evaluate(node.left, columns, cache)
+        right = evaluate(node.right, columns, cache)
+        result = arithmetic_ops[type(node.op)](left, right)
+
+    #chained comparisons, such as 1 < Num_Years <= 3, are each true
+    else:
+        left = evaluate(node.left, columns, cache)
+        result = True
+        for op, comparator in zip(node.ops, node.comparators):
+            right = evaluate(comparator, columns, cache)
+            result = np.logical_and(result, compare_ops[type(op)](left, right))
+            left = right
+
+    cache[key] = result
+    return result
+
+def as_mask(values):
+    """
+    Converts values to a boolean mask, where values other than 0 are True.
+
+    Arg:
+        values (numpy.ndarray): column or evaluated condition.
+
+    Returns:
+        numpy.ndarray: of booleans.
+    """
+    values = np.asarray(values)
+    return values if values.dtype == bool else values != 0
+
+def get_masks(df, segments):
+    """
+    Evaluates conditions of all segments together in one pass over df, with each column read
+    once and shared conditions evaluated once.
+
+    Args:
+        df (pandas.DataFrame): data from data/processed/<NAME>-donors.csv.
+        segments (dict): segment specs keyed on names, as in SEGMENTS.
+
+    Returns:
+        pandas.DataFrame: a boolean column per segment, with a row per donor.
+    """
+    columns = {col: df[col].to_numpy() for col in df.columns}
+    cache = {}
+    masks = {}
+    for name, spec in segments.items():
+        conditions, _ = get_spec(spec)
+        masks[name] = np.broadcast_to(evaluate(compile_conditions(conditions), columns, cache),
+                                      len(df))
+    return pd.DataFrame(masks, index=df.index)
+
+def aggregate(df, df_masks, segments):
+    """
+    Aggregates donors in each segment. Sums and means for all segments are computed together,
+    as a matrix product of segment masks and columns. Missing values are skipped, the same as
+    with pandas aggregations.
+
+    Args:
+        df (pandas.DataFrame): data from data/processed/<NAME>-donors.csv.
+        df_masks (pandas.DataFrame): segment masks from get_masks().
+        segments (dict): segment specs keyed on names, as in SEGMENTS.
+
+    Returns:
+        pandas.DataFrame: aggregations per segment, with Frequencies.
+    """
+    masks = df_masks.to_numpy()
+    frequencies = masks.sum(axis=0)
+
+    cols = list(dict.fromkeys(col for spec in segments.values() for col in get_spec(spec)[1]))
+    values = df[cols].to_numpy(dtype='float64')
+    missing = np.isnan(values)
+
+    #missing values add 0 to sums, and aren't counted in means
+    weights = masks.T.astype('float64')
+    sums = weights @ np.where(missing, 0, values)
+    counts = weights @ ~missing
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+
+    groups = pd.DataFrame(index=df_masks.columns, columns=cols, dtype='float64')
+    for i, (name, spec) in enumerate(segments.items()):
+        for col, func in get_spec(spec)[1].items():
+            j = cols.index(col)
+            if func == 'sum':
+                groups.loc[name, col] = sums[i, j]
+            elif func == 'mean':
+                groups.loc[name, col] = means[i, j]
+            elif func in ('min', 'max'):
+                if counts[i, j]:
+                    nanfunc = np.nanmin if func == 'min' else np.nanmax
+                    groups.loc[name, col] = nanfunc(values[masks[:, i], j])
+            else:
+                raise ValueError(f'Unsupported aggregation for segment {name}: {func}')
+
+    groups['Frequencies'] = frequencies
+    return groups
+
+def main():
+    names = parse_args()
+    segments = {name: SEGMENTS[name] for name in names} if names else SEGMENTS
+    df = get_data()
+    output_dir = get_output_dir('segments')
+
+    df_masks = get_masks(df, segments)
+    groups = aggregate(df, df_masks, segments)
+    print('\n\nSEGMENTS:\n', groups)
+
+    df_assignments = pd.concat([df[['ID']], df_masks.astype(int)], axis=1)
+    df_assignments.to_csv(os.path.join(output_dir, 'assignments.csv'), index=False)
+    groups.to_csv(os.path.join(output_dir, 'groups.csv'))
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,9 @@
 import argparse
+import numpy as np
 import pandas as pd
-from src.process.helpers import clean
-from src.segment.passport_gifts import set_categories
+from src.process.daily import get_daily
+from src.segment.helpers import get_categories
 from src import (
-    DATA_DONORS_RAW, 
-    DATA_DONORS_WORKING, 
     YEAR_CUTOFF,
     DATA_START, 
     DATA_END
@@ -38,16 +37,14 @@ def parse_args():
 
 def get_data():
     """
-    Gets dataframe from donors working data in data/processed/, creating 
-    donors working data from donors raw data in data/raw/ if needed.
+    Gets dataframe of daily rollup data from src.process.daily.get_daily(), which is built once 
+    from donors working data in data/processed/, and reused for every timeline frequency and 
+    category.
 
     Returns:
         pandas.DataFrame.
     """
-    cols_new = ['ID', 'Status', 'Sustainer', 'Major', 'Passport', 'Date', 'Type', 'Gift', 'Page']
-    cols_keep = ['Count', 'Paid to Date', 'Balance']
-    df = clean(DATA_DONORS_RAW, DATA_DONORS_WORKING, cols_new, cols_keep)
-    return df
+    return get_daily()
 
 def get_time_frequency(time_period):
     """
@@ -75,7 +72,7 @@ def add_category_column(df, categories):
     Adds Category column to dataframe, so timeline can include segmented layers.
 
     Args:
-        df (pandas.DataFrame):  dataframe of donations from donors working data in data/processed/.
+        df (pandas.DataFrame): daily rollup data from get_data().
         categories (str): Categories label to determine timeline segments: 'all', 'passport_gifts, 'new_other'. 
 
     Returns:
@@ -84,14 +81,12 @@ def add_category_column(df, categories):
     if categories == 'all':
         df['Category'] = 'Donations'
 
+    #Gift values other than NO, including missing values, count as gifts
     if categories == 'passport_gifts':
-        df['Passport'] = df['Passport'] - pd.offsets.DateOffset(years=1) #match 1-yr pledge window
-        df['Passport'] = df.apply(lambda x: 1 if x['Passport'] < x['Date'] else 0, axis=1) 
-        df['Gift'] = df['Gift'].map({'YES': 1, 'NO': 0})
-        df = set_categories(df) 
+        df['Category'] = get_categories(df['Passport'], df['Gift'] != 'NO')
 
     if categories == 'new_other':
-        df['Category'] = df['Type'].map(lambda x: 'New' if x == 'NEW' else 'Other')
+        df['Category'] = np.where(df['Type'] == 'NEW', 'New', 'Other')
 
     return df    
 
@@ -104,17 +99,16 @@ def create_timeline(
     date_end=DATA_END
 ):
     """
-    Gets member donation data file and then:
+    Gets daily rollup data and then:
         -filters by date_start and date_end
-        -creates Payments and Category columns
-        -drops unneeded columns
+        -creates Category column
         -turns Date column into time frequencies
         -creates pivot table with Date as index, categories as 
          columns, and Payments summed
         -saves csv file as output_file        
 
     Args:
-        df (pandas.DataFrame):  dataframe of donations from donors working data in data/processed/.
+        df (pandas.DataFrame): daily rollup data from get_data().
         output_file (str): path to where results are saved as a csv file.
         time_period (str): Desired time period frequency for timeline. 
         categories (str): Categories label to determine timeline segments: 'all', 'passport_gifts, 'new_other'.
@@ -122,22 +116,20 @@ def create_timeline(
         date_end (str): for date range filter, is inclusive, in format 2022-09-30.
      """  
 
-    df = df[(df['Date'] >= date_start) & (df['Date'] <= date_end)] #filter by date range    
-    df['Payments'] = df['Paid to Date'] + df['Balance'] #add paid and balance
+    df = df[(df['Date'] >= date_start) & (df['Date'] <= date_end)].copy() #filter by date range    
     df = add_category_column(df, categories) #add segments (or all 'Donations')
-    df = df[['Date', 'Payments', 'Category']] #keep only needed fields
 
     #create timeline frequencies
     freq_arg = get_time_frequency(time_period)
-    df['Date'] = pd.to_datetime(df['Date']).dt.to_period(freq_arg) #set time period
+    df['Date'] = df['Date'].dt.to_period(freq_arg) #set time period
 
     table = df.pivot_table(index='Date', 
                        columns='Category', 
                        values='Payments', 
                        aggfunc='sum', 
-                       fill_value=0)
+                       fill_value=0,
+                       observed=True)
 
     table.index.name = None
     table.columns.name = None
     table.to_csv(output_file)
- 
\ No newline at end of file
@@ -0,0 +1,79 @@
+import os
+import sys
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from .helpers import get_data, create_timeline
+from src.helpers import get_output_dir
+
+def parse_args():
+    """
+    Parses command-line options for which categories and frequencies to create timelines for,
+    with each defaulting to all of them.
+
+    Examples:
+        $ python -m src.timeline.multi
+        $ python -m src.timeline.multi --categories all passport_gifts --frequencies monthly weekly
+
+    Returns:
+        tuple: lists of categories and frequencies specified by the user.
+    """
+    parser = argparse.ArgumentParser(description='Run timeline multi module')
+    parser.add_argument(
+        '--categories',
+        nargs='+',
+        choices=['all', 'new_other', 'passport_gifts'],
+        default=['all', 'new_other', 'passport_gifts'],
+        help='Specify categories to create timelines for, e.g. all, new_other or passport_gifts'
+    )
+    parser.add_argument(
+        '--frequencies',
+        nargs='+',
+        choices=['annual', 'monthly', 'weekly'],
+        default=['annual', 'monthly', 'weekly'],
+        help='Specify time period frequencies to create timelines for, e.g. annual, monthly or weekly'
+    )
+    args, unknown = parser.parse_known_args()
+    return args.categories, args.frequencies
+
+def create_timelines(df, output_dir, categories, frequencies, max_workers=None):
+    """
+    Creates a timeline for each combination of categories and frequencies from the same data,
+    running create_timeline() for each concurrently in a thread pool, and saving each to
+    output_dir as <categories>_<frequency>.csv.
+
+    Args:
+        df (pandas.DataFrame): daily rollup data from helpers.get_data().
+        output_dir (str): path to output directory.
+        categories (List[str]): categories labels: 'all', 'passport_gifts, 'new_other'.
+        frequencies (List[str]): time period frequencies: 'annual', 'monthly', 'weekly'.
+        max_workers (int): max number of threads, with None using the executor default.
+
+    Returns:
+        List[str]: paths to saved files.
+    """
+    jobs = [(category, frequency) for category in categories for frequency in frequencies]
+    output_files = [os.path.join(output_dir, f'{category}_{frequency}.csv')
+                    for category, frequency in jobs]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(create_timeline, df, output_file, frequency, category)
+                   for (category, frequency), output_file in zip(jobs, output_files)]
+
+        #raise any errors from threads
+        for future in futures:
+            future.result()
+
+    for output_file in output_files:
+        print('\nSAVED:', output_file)
+
+    return output_files
+
+def main():
+    categories, frequencies = parse_args()
+    df = get_data()
+    output_dir = get_output_dir('timeline')
+    create_timelines(df, output_dir, categories, frequencies)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,37 @@
+import os
+import sys
+from tests.src.helpers import compare_spreadsheets
+from src import ROOT_DIR
+from src.augment.multi import parse_args, augment
+
+#files each overlay saves per target
+outputs = {
+    'demographics': {
+        'cluster': ['demographics'],
+        'new_donors': ['demographics'],
+        'passport_gifts': ['demographics'],
+        'passport_only': ['demographics']
+    },
+    'passport': {
+        'cluster': ['views_0', 'views_1', 'views_2', 'views_3', 'views_all'],
+        'new_donors': ['views_all', 'views_both', 'views_passport'],
+        'passport_gifts': ['views_all', 'views_both', 'views_passport'],
+        'passport_only': ['views']
+    }
+}
+
+def main():
+    targets, overlays = parse_args()
+    output_dir = os.path.join(ROOT_DIR, 'tests', 'output')
+    timings = augment(output_dir, targets, overlays)
+
+    #compare csv files for targets that were augmented
+    for target in timings['Target'].unique():
+        for overlay in overlays:
+            for name in outputs[overlay].get(target, []):
+                output_file = os.path.join(output_dir, target, name + '.csv')
+                output_file_expected = output_file.replace('output', 'output_expected')
+                compare_spreadsheets(output_file, output_file_expected)
+
+if __name__ == '__main__':
+    sys.exit(main())
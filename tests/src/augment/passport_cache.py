@@ -0,0 +1,144 @@
+import os
+import sys
+import sqlite3
+from contextlib import closing
+import numpy as np
+import pandas as pd
+from tests.src.helpers import compare_spreadsheets
+from src.augment.passport_cache import get_cached_views, get_local_views
+from src import DATA_PROCESSED_DIR
+
+def create_local_db(db_file):
+    """
+    Creates a local stand-in Passport database with random daily views for ten accounts.
+
+    Args:
+        db_file (str): path to SQLite database.
+
+    Returns:
+        None.
+    """
+    rng = np.random.default_rng(42)
+    shows = {'Nova': 'Science', 'Frontline': 'News', 'Masterpiece': 'Drama', 'Nature': 'Science'}
+    dates = pd.date_range('2021-10-01', '2022-09-30', freq='D').strftime('%Y-%m-%d')
+
+    df = pd.DataFrame({
+        'alleg_account_id': rng.integers(1, 11, 5000),
+        'date': rng.choice(dates, 5000),
+        'content_channel': rng.choice(list(shows), 5000),
+        'total_count': rng.integers(1, 5, 5000)
+    })
+    df['genre'] = df['content_channel'].map(shows)
+
+    with closing(sqlite3.connect(db_file)) as con:
+        df.to_sql('views', con, if_exists='replace', index=False)
+
+def compare_views(df_cached, df_direct, name):
+    """
+    Saves views from the cache and views queried directly, sorted the same, and runs
+    compare_spreadsheets() on them.
+
+    Args:
+        df_cached (pandas.DataFrame): views from get_cached_views().
+        df_direct (pandas.DataFrame): views from get_local_views().
+        name (str): name to save files as.
+
+    Returns:
+        None.
+    """
+    files = []
+    for df, append in [(df_cached, 'cached'), (df_direct, 'direct')]:
+        df = df.sort_values(['alleg_account_id', 'content_channel'], ignore_index=True)
+        files.append(os.path.join(DATA_PROCESSED_DIR, f'{name}-{append}.csv'))
+        df.to_csv(files[-1], index=False)
+    compare_spreadsheets(*files)
+
+def compare_queries(queries, queries_expected):
+    """
+    Prints whether only expected months and accounts were queried, in any order since queries
+    run concurrently.
+
+    Args:
+        queries (List[tuple]): start, end and ids of each query made.
+        queries_expected (List[tuple]): start, end and ids of each query expected.
+
+    Returns:
+        None.
+    """
+    print('\n' + '='*100)
+    print('QUERIES:')
+    for query in sorted(queries):
+        print(f'  - {query}')
+
+    if sorted(queries) == sorted(queries_expected):
+        print('\nTEST PASSED')
+    else:
+        print('\nTEST FAILED')
+
+def main():
+    db_file = os.path.join(DATA_PROCESSED_DIR, 'passport-views-local.sqlite')
+    cache_file = os.path.join(DATA_PROCESSED_DIR, 'passport-views-cache-test.sqlite')
+    if os.path.isfile(cache_file):
+        os.remove(cache_file)
+    create_local_db(db_file)
+
+    queries = []
+    def get_views(date_start, date_end, ids):
+        queries.append((date_start, date_end, ids))
+        return get_local_views(date_start, date_end, ids.split(','), db_file)
+
+    #first run fetches every month, and a rerun fetches nothing
+    ids = [1, 2, 3, 4, 5, 6]
+    for run in range(2):
+        df = get_cached_views('2021-10-01', '2022-01-31', ids, get_views, cache_file)
+        compare_views(df, get_local_views('2021-10-01', '2022-01-31', ids, db_file), 'views-a')
+
+    compare_queries(queries, [
+        ('2021-10-01', '2021-10-31', '1,2,3,4,5,6'),
+        ('2021-11-01', '2021-11-30', '1,2,3,4,5,6'),
+        ('2021-12-01', '2021-12-31', '1,2,3,4,5,6'),
+        ('2022-01-01', '2022-01-31', '1,2,3,4,5,6')
+    ])
+
+    #overlapping run only fetches new accounts in cached months, and new months
+    queries.clear()
+    ids = [4, 5, 6, 7, 8, 9]
+    df = get_cached_views('2021-12-01', '2022-03-15', ids, get_views, cache_file)
+    compare_views(df, get_local_views('2021-12-01', '2022-03-15', ids, db_file), 'views-b')
+
+    compare_queries(queries, [
+        ('2021-12-01', '2021-12-31', '7,8,9'),
+        ('2022-01-01', '2022-01-31', '7,8,9'),
+        ('2022-02-01', '2022-02-28', '4,5,6,7,8,9'),
+        ('2022-03-01', '2022-03-15', '4,5,6,7,8,9')
+    ])
+
+    #ids are queried in batches, with only missing ids in each
+    queries.clear()
+    ids = [8, 9, 10, 11, 12, 13, 14]
+    df = get_cached_views('2022-01-01', '2022-02-28', ids, get_views, cache_file, batch_size=3)
+    compare_views(df, get_local_views('2022-01-01', '2022-02-28', ids, db_file), 'views-c')
+
+    compare_queries(queries, [
+        ('2022-01-01', '2022-01-31', '10,11,12'),
+        ('2022-01-01', '2022-01-31', '13,14'),
+        ('2022-02-01', '2022-02-28', '10,11,12'),
+        ('2022-02-01', '2022-02-28', '13,14')
+    ])
+
+    #months that haven't settled yet are queried again on every run, and not cached
+    settle_days = (pd.Timestamp.today().normalize() - pd.Timestamp('2022-04-15')).days
+    ids = [1, 2, 3]
+    for run in range(2):
+        queries.clear()
+        df = get_cached_views('2022-03-01', '2022-05-31', ids, get_views, cache_file,
+                              settle_days=settle_days)
+        compare_views(df, get_local_views('2022-03-01', '2022-05-31', ids, db_file), 'views-d')
+
+        compare_queries(queries, [('2022-03-01', '2022-03-31', '1,2,3')][run:] + [
+            ('2022-04-01', '2022-04-30', '1,2,3'),
+            ('2022-05-01', '2022-05-31', '1,2,3')
+        ])
+
+if __name__ == '__main__':
+    sys.exit(main())
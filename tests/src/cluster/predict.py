@@ -0,0 +1,39 @@
+import os
+import sys
+from src.helpers import get_data, get_output_dir
+from src.process.cache import hash_frame
+from src.cluster.helpers import fit_scaler, prep_data, get_model_path, merge_cluster_labels
+from src.cluster.kmeans import run_kmeans
+from src.cluster.predict import predict
+from tests.src.helpers import compare_spreadsheets
+
+def main():
+    df = get_data()
+    scaler = fit_scaler(df)
+    df_std = prep_data(df, scaler=scaler)
+    data_hash = hash_frame(df)
+    output_dir = get_output_dir('cluster')
+    output_predict_dir = get_output_dir('cluster_predict')
+
+    #fit and save model, then assign same donors with saved model
+    ser_cluster_labels = run_kmeans(df_std, output_dir, clusters_pca_scatterplots=range(4,5),
+                                    kmeans_random_state=42, scaler=scaler, data_hash=data_hash)
+    merge_cluster_labels(df, ser_cluster_labels, output_dir)
+    model_file = get_model_path(data_hash, 4, 42)
+    ser_predicted_labels = predict(df, model_file, output_predict_dir)
+
+    #test that saved model reproduces fitted assignments 
+    labels = ser_cluster_labels.tolist()
+    predicted = ser_predicted_labels.tolist()
+    assert labels == predicted, 'TEST FAILED: predicted clusters != fitted clusters'
+    print()
+    print('='*50)
+    print('\nTEST PASSED: predicted clusters == fitted clusters')  
+
+    #compare groups.csv files
+    groups = os.path.join(output_dir, 'groups.csv')
+    groups_predicted = os.path.join(output_predict_dir, 'groups.csv')
+    compare_spreadsheets(groups, groups_predicted)     
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,32 @@
+import os
+import sys
+from src.helpers import get_data
+from src.segment.new_donors import get_data as get_data_new
+from src.process import donors, new_donors
+from src.process.delta import update
+from tests.src.helpers import compare_spreadsheets 
+from src import (
+    DATA_RAW_DIR,
+    DATA_PROCESSED_DIR,
+    DATA_DONORS_PROCESSED,
+    DATA_DONORS_NEW_PROCESSED,
+)
+
+def main():
+    #make sure processed files are current, so update() only reprocesses delta donors
+    get_data()
+    get_data_new()
+    update(os.path.join(DATA_RAW_DIR, 'donors-delta.xlsx'))
+
+    #fully reprocess merged working file to compare against
+    donors_full = os.path.join(DATA_PROCESSED_DIR, 'donors-full.csv')
+    donors_new_full = os.path.join(DATA_PROCESSED_DIR, 'donors-new-full.csv')
+    donors.process_data(data_file_processed=donors_full)
+    new_donors.process_data(data_file_processed=donors_new_full)
+
+    #compare processed files
+    compare_spreadsheets(DATA_DONORS_PROCESSED, donors_full)
+    compare_spreadsheets(DATA_DONORS_NEW_PROCESSED, donors_new_full)
+
+if __name__ == '__main__': 
+    sys.exit(main())
@@ -4,6 +4,8 @@ from src.process.donors import process_data
 from tests.src.helpers import compare_spreadsheets 
 from src import (
     DATA_DONORS_WORKING,
+    DATA_DONORS_WORKING_EXPORT,
+    DATA_DONORS_PLEDGES,
     DATA_EXPECTED_DONORS_WORKING,
     DATA_DONORS_PROCESSED,
     DATA_EXPECTED_DONORS_PROCESSED,
@@ -11,13 +13,14 @@ from src import (
 
 def main():
     if True: #toggle whether to also generate and test working file
-        if os.path.exists(DATA_DONORS_WORKING):
-            os.remove(DATA_DONORS_WORKING)
+        for file in [DATA_DONORS_WORKING, DATA_DONORS_WORKING_EXPORT, DATA_DONORS_PLEDGES]:
+            if os.path.exists(file):
+                os.remove(file)
 
     process_data()
 
     #compare working files
-    compare_spreadsheets(DATA_DONORS_WORKING, DATA_EXPECTED_DONORS_WORKING)
+    compare_spreadsheets(DATA_DONORS_WORKING_EXPORT, DATA_EXPECTED_DONORS_WORKING)
     
     #compare processed files
     compare_spreadsheets(DATA_DONORS_PROCESSED, DATA_EXPECTED_DONORS_PROCESSED)
@@ -0,0 +1,19 @@
+import os
+import sys
+from src.helpers import get_output_dir
+from src.segment.new_donors import parse_args, get_data
+from src.segment.retention import save_retention
+from tests.src.helpers import compare_spreadsheets
+
+def main():
+    output_dir = get_output_dir('retention')
+    output_expected_dir = output_dir.replace('output', 'output_expected')
+    files = save_retention(get_data(), parse_args(), output_dir)
+
+    #compare donors.csv, rates.csv and revenue.csv files
+    for output_file in files:
+        output_file_expected = os.path.join(output_expected_dir, os.path.basename(output_file))
+        compare_spreadsheets(output_file, output_file_expected)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+from src import SEGMENTS
+from src.helpers import get_data, get_output_dir
+from src.segment.specs import get_spec, get_masks, aggregate
+from tests.src.helpers import compare_spreadsheets
+
+#segments added to SEGMENTS for testing negated comparisons, and min and max
+segments_test = {
+    'negated_major': '-(Major > 0) < 0',
+    'passport_range': {
+        'where': 'Passport and not Major',
+        'aggregate': {'Total_Payments': 'min', 'Annual_Payment': 'max', 'Annual_Count': 'mean'}
+    }
+}
+
+def aggregate_rows(df, segments):
+    """
+    Aggregates segments by evaluating each segment's conditions as Python on each row, and
+    aggregating with pandas, to check get_masks() and aggregate() against.
+
+    Args:
+        df (pandas.DataFrame): data from data/processed/donors.csv.
+        segments (dict): segment specs keyed on names, as in SEGMENTS.
+
+    Returns:
+        pandas.DataFrame: aggregations per segment, with Frequencies.
+    """
+    rows = df.to_dict('records')
+    groups = {}
+    for name, spec in segments.items():
+        conditions, aggregates = get_spec(spec)
+        mask = np.array([bool(eval(conditions, {'__builtins__': {}}, row)) for row in rows])
+        groups[name] = {col: df.loc[mask, col].agg(func) for col, func in aggregates.items()}
+        groups[name]['Frequencies'] = mask.sum()
+    return pd.DataFrame.from_dict(groups, orient='index')
+
+def main():
+    df = get_data()
+    output_dir = get_output_dir('segments')
+    segments = {**SEGMENTS, **segments_test}
+
+    #a missing value for a donor outside major_donors shouldn't change major_donors
+    df = df.copy()
+    df.loc[df.index[df['Major'] == 0][0], 'Total_Payments'] = np.nan
+
+    groups = aggregate(df, get_masks(df, segments), segments)
+    groups_rows = aggregate_rows(df, segments)[groups.columns]
+
+    groups_file = os.path.join(output_dir, 'groups.csv')
+    groups_rows_file = os.path.join(output_dir, 'groups_rows.csv')
+    groups.to_csv(groups_file)
+    groups_rows.to_csv(groups_rows_file)
+    compare_spreadsheets(groups_file, groups_rows_file)
+
+if __name__ == '__main__':
+    sys.exit(main())
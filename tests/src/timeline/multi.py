@@ -0,0 +1,20 @@
+import sys
+
+from src.timeline.helpers import get_data
+from src.timeline.multi import parse_args, create_timelines
+from src.helpers import get_output_dir
+from tests.src.helpers import compare_spreadsheets
+
+def main():
+    categories, frequencies = parse_args()
+    df = get_data()    
+    output_dir = get_output_dir('timeline') 
+    output_files = create_timelines(df, output_dir, categories, frequencies)
+
+    #compare csv files
+    for output_file in output_files:
+        output_file_expected = output_file.replace('output', 'output_expected')   
+        compare_spreadsheets(output_file, output_file_expected)
+
+if __name__ == '__main__':
+    sys.exit(main())